@@ -1,21 +1,76 @@
 import pygame
 from pygame.math import Vector2
-from StateMachine import GameState, BallType, Player, State, SnookerInnerState
-from Physics import Ball, CueBall, Hole
+from StateMachine import GameState, BallType, Player, State, SnookerInnerState, Foul
+from Physics import Ball, CueBall, Hole, TableState, Solver
 from Calc import check_line_circle_collision, closest_point_on_line
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 from random import uniform, randint, choice
+from copy import deepcopy
+from contextlib import contextmanager
+from time import perf_counter
+from multiprocessing import Pool
+from multiprocessing.pool import AsyncResult
+import Simulation
+from Events import events, Event
 
 win: pygame.surface.Surface = None
-brake_random = Vector2(uniform(-10, 10),100)
+
+TURN_DELAY = 60 * 3 # ticks the cpu waits with its shot, so it can be watched
+
+# shot search
+SEARCH_POWERS = [0.4, 0.25, 0.6]
+SEARCH_ANGLE_JITTER = 2.0 # degrees around a candidate direction once the plain candidates are exhausted
+SEARCH_POWER_RANGE = (0.15, 0.9)
+WIN_VALUE = 1000
+POT_VALUE = 10
+KEEP_TURN_VALUE = 5
+FOUL_VALUE = 20
+LEAVE_VALUE = 2
+LEAVE_MAX_OPTIONS = 3
+
+def play_outcome(game_state: GameState, outcome: Simulation.ShotOutcome) -> GameState:
+    ''' the game state after a simulated shot, using the rules of the game. the given game state is left untouched '''
+    state = deepcopy(game_state)
+    state.current_state = State.WAIT_FOR_STABLE
+    with events.muted():
+        state.update_potted(list(outcome.potted))
+        state.first_touch = outcome.first_touch
+        state.update()
+    return state
+
+class Plan:
+    ''' what the cpu decided for one stable table, made once and played out over the turn '''
+    def __init__(self, shot_type: str, direction: Vector2, power: float, cue_pos: Vector2=None,
+                 targets: List[Tuple[Vector2, Vector2]]=None, best_target: Tuple[Vector2, Vector2]=None):
+        self.shot_type = shot_type
+        self.direction = direction
+        self.power = power
+        self.cue_pos = cue_pos # where to place the cue ball when it is in hand
+        self.targets = targets if targets is not None else []
+        self.best_target = best_target
+
+# the copy of the cpu living in a planner process
+_planner: 'PlayerCpu' = None
+
+def _init_planner(cpu: 'PlayerCpu', table_center: Tuple[float, float], pool_line: float):
+    global _planner
+    Simulation._init_worker(table_center, pool_line)
+    _planner = cpu
+
+def _plan_task(game_state: GameState, table_state: TableState) -> Plan:
+    _planner.game_state = game_state
+    with Simulation.isolated_balls():
+        table_state.place()
+        return _planner.plan_turn()
 
 class PlayerCpu:
-    def __init__(self, game_state: GameState, player: Player, dificulty = 3):
+    def __init__(self, game_state: GameState, player: Player, dificulty = 3, search_budget: float=None, solver: Solver=Solver.FIXED_STEP, background: bool=False):
         self.game_state = game_state
 
         self.targets = []
         self.best_target = []
         self.timer = 0
+        self.turn_delay = TURN_DELAY
 
         self.player = player
         self.debug = True
@@ -25,6 +80,23 @@ class PlayerCpu:
         self.direction: Vector2 = None
         self.power = 1
 
+        # seconds per turn for simulating candidate shots, None keeps the geometric shot choice
+        self.search_budget = search_budget
+        self.solver = solver
+
+        # a plan is made once per stable table. in the background it is made by a planner process
+        # holding its own copy of this cpu, so the game keeps drawing frames meanwhile
+        self.plan: Plan = None
+        self.background = background
+        self.planner: Pool = None
+        self.pending: AsyncResult = None
+
+        self.pot_cache_key: Tuple[bytes, int] = None
+        self.pot_cache: Dict = {}
+
+        # set by the game when the match is recorded
+        self.recorder = None
+
     def get_closest_holes_to_ball(self, ball: Ball, amount=2) -> Hole:
         distances = []
         for hole in Hole._reg:
@@ -40,7 +112,34 @@ class PlayerCpu:
         ghost_pos = ball.pos - dir_to_hole * Ball._radius * 2
         return ghost_pos
 
+    def get_pot_cache(self) -> Dict:
+        ''' clear path results for the balls as they are now, dropped as soon as any ball moves '''
+        cue_index = Ball._cue_ball.index if Ball._cue_ball else None
+        key = (Ball._arrays.pos.tobytes(), cue_index)
+        if key != self.pot_cache_key:
+            self.pot_cache_key = key
+            self.pot_cache = {}
+        return self.pot_cache
+
+    def is_path_clear(self, start: Vector2, end: Vector2, ball: Ball) -> bool:
+        for other_ball in Ball._reg:
+            if other_ball.get_type() == BallType.BALL_CUE or other_ball is ball:
+                continue
+            if check_line_circle_collision(start, end, other_ball.pos, Ball._radius, Ball._radius):
+                return False
+        return True
+
     def can_pot_ball_in_hole(self, ball: Ball, hole: Hole, cue_pos: Vector2) -> bool:
+        # rows of the arrays identify the balls while the cache is valid
+        cache = self.get_pot_cache()
+        key = (ball.index, hole, cue_pos[0], cue_pos[1])
+        result = cache.get(key)
+        if result is None:
+            result = self.check_pot_ball_in_hole(ball, hole, cue_pos, cache)
+            cache[key] = result
+        return result
+
+    def check_pot_ball_in_hole(self, ball: Ball, hole: Hole, cue_pos: Vector2, cache: Dict) -> bool:
 
         # calculate ghost position
         dir_to_hole = (hole.target_pos - ball.pos).normalize()
@@ -52,27 +151,16 @@ class PlayerCpu:
             return False
 
         # check if cue to ghost positon is clear
-        cue_to_ghost_clear = True
-        for other_ball in Ball._reg:
-            if other_ball.get_type() == BallType.BALL_CUE or other_ball is ball:
-                continue
-            if check_line_circle_collision(cue_pos, ghost_pos, other_ball.pos, Ball._radius, Ball._radius):
-                cue_to_ghost_clear = False
-                break
-        if not cue_to_ghost_clear:
+        if not self.is_path_clear(cue_pos, ghost_pos, ball):
             return False
         
-        # check if ball to hole is clear
-        ball_to_hole_clear = True
-        for other_ball in Ball._reg:
-            if other_ball.get_type() == BallType.BALL_CUE or other_ball is ball:
-                continue
-            if check_line_circle_collision(ball.pos, hole.target_pos, other_ball.pos, Ball._radius, Ball._radius):
-                ball_to_hole_clear = False
-                break
-        if not ball_to_hole_clear:
-            return False
-        return True
+        # check if ball to hole is clear, the same for every cue position
+        key = (ball.index, hole)
+        ball_to_hole_clear = cache.get(key)
+        if ball_to_hole_clear is None:
+            ball_to_hole_clear = self.is_path_clear(ball.pos, hole.target_pos, ball)
+            cache[key] = ball_to_hole_clear
+        return ball_to_hole_clear
 
     def get_direction(self) -> Vector2:
         return self.direction
@@ -81,22 +169,26 @@ class PlayerCpu:
         ''' check if the ball is okay for potting '''
         ...
 
-    def step_shoot_ball(self) -> bool:
-        available_balls_holes = []
-        
+    def get_pot_options(self, cue_pos: Vector2) -> List[Tuple[Ball, Hole, float]]:
+        ''' valid balls that can be potted from cue_pos, with the straightness of the shot as score '''
+        options = []
         for ball in Ball._reg:
             if not self.check_ball_validity(ball):
                 continue
             for hole in Hole._reg:
-                if self.can_pot_ball_in_hole(ball, hole, Ball._cue_ball.pos):
-                    self.targets.append((ball.pos, hole.target_pos))
-
+                if self.can_pot_ball_in_hole(ball, hole, cue_pos):
                     # calculate score
-                    dir_cue_to_ball = (ball.pos - Ball._cue_ball.pos).normalize()
+                    dir_cue_to_ball = (ball.pos - cue_pos).normalize()
                     dir_ball_to_hole = (hole.target_pos - ball.pos).normalize()
                     score = dir_cue_to_ball.dot(dir_ball_to_hole)
                     
-                    available_balls_holes.append((ball, hole, score))
+                    options.append((ball, hole, score))
+        return options
+
+    def step_shoot_ball(self) -> bool:
+        available_balls_holes = self.get_pot_options(Ball._cue_ball.pos)
+        for ball, hole, score in available_balls_holes:
+            self.targets.append((ball.pos, hole.target_pos))
         
         if len(available_balls_holes) > 0:
             self.best_target = max(available_balls_holes, key=lambda x: x[2])
@@ -115,11 +207,13 @@ class PlayerCpu:
             return False
         
         self.shot_type = 'brake shot'
-        self.direction = brake_random
+        # drawn when the shot is planned, so a seeded game breaks the same every time
+        self.direction = Vector2(uniform(-10, 10), 100)
         self.power = 1.0
         return True
     
-    def step_touch(self) -> bool:
+    def get_accessible_balls(self) -> List[Ball]:
+        ''' valid balls with a clear straight line from the cue ball '''
         ball_options = []
         for ball in Ball._reg:
             if not self.check_ball_validity(ball):
@@ -138,6 +232,10 @@ class PlayerCpu:
             
             if ball_accessible:
                 ball_options.append(ball)
+        return ball_options
+
+    def step_touch(self) -> bool:
+        ball_options = self.get_accessible_balls()
         
         if len(ball_options) == 0:
             return False
@@ -149,6 +247,110 @@ class PlayerCpu:
         self.power = 0.3
         return True
 
+    def step_snookered(self) -> bool:
+        ''' no valid ball in sight, hit the closest ball of any kind and give the foul away '''
+        cue_pos = Ball._cue_ball.pos
+        others = [ball for ball in Ball._reg if ball is not Ball._cue_ball]
+        if len(others) == 0:
+            return False
+
+        self.shot_type = 'snookered'
+        target = min(others, key=lambda ball: ball.pos.distance_squared_to(cue_pos))
+        self.direction = (target.pos - cue_pos).normalize()
+        self.power = 0.3
+        return True
+
+    def get_candidate_directions(self) -> List[Vector2]:
+        ''' directions worth simulating, to the ghost ball of every pottable ball and straight at every accessible ball '''
+        cue_pos = Ball._cue_ball.pos
+        directions = []
+        for ball, hole, score in sorted(self.get_pot_options(cue_pos), key=lambda x: -x[2]):
+            self.targets.append((ball.pos, hole.target_pos))
+            directions.append((self.get_ghost_position(ball, hole) - cue_pos).normalize())
+        for ball in self.get_accessible_balls():
+            directions.append((ball.pos - cue_pos).normalize())
+        return directions
+
+    @contextmanager
+    def hypothetical(self, game_state: GameState, table_state: TableState):
+        ''' plan against game_state and the balls of table_state instead of the live game '''
+        live_state, live_targets = self.game_state, self.targets
+        self.game_state = game_state
+        self.targets = []
+        try:
+            with Simulation.isolated_balls():
+                table_state.place()
+                yield
+        finally:
+            self.game_state, self.targets = live_state, live_targets
+
+    def evaluate_leave(self, game_state: GameState, table_state: TableState) -> float:
+        ''' value of the table left for the next shot of this player '''
+        if 0 not in table_state.numbers:
+            return 0.0
+        with self.hypothetical(game_state, table_state):
+            options = len(self.get_pot_options(Ball._cue_ball.pos))
+        return LEAVE_VALUE * min(options, LEAVE_MAX_OPTIONS)
+
+    def score_turn(self, before: GameState, after: GameState) -> float:
+        ''' value of a turn for this player from the game states around it, without the leave '''
+        if after.get_state() == State.GAME_OVER:
+            return WIN_VALUE if after.player_winner == self.player else -WIN_VALUE
+        
+        opponent = self.player.next()
+        value = POT_VALUE * ((after.score[self.player] - before.score[self.player]) -
+                             (after.score[opponent] - before.score[opponent]))
+        if after.last_foul != Foul.NONE:
+            value -= FOUL_VALUE
+        if after.get_player() == self.player:
+            value += KEEP_TURN_VALUE
+        return value
+
+    def score_outcome(self, outcome: Simulation.ShotOutcome) -> float:
+        ''' value of a simulated shot for this player: pots, fouls, keeping the turn and the leave '''
+        state = play_outcome(self.game_state, outcome)
+        value = self.score_turn(self.game_state, state)
+        if state.get_state() != State.GAME_OVER and state.get_player() == self.player:
+            value += self.evaluate_leave(state, outcome.table_state)
+        return value
+
+    def search_shot(self) -> Tuple[Vector2, float, float]:
+        '''
+        simulate shots around the geometric candidates until the time budget runs out.
+        returns the best (direction, power, value), None if there is nothing to aim at
+        '''
+        start = perf_counter()
+        directions = self.get_candidate_directions()
+        if len(directions) == 0:
+            return None
+        
+        samples = [(direction, power) for direction in directions for power in SEARCH_POWERS]
+        table_state = TableState.capture()
+        best = None
+        count = 0
+        while count == 0 or perf_counter() - start < self.search_budget:
+            if count < len(samples):
+                direction, power = samples[count]
+            else:
+                direction = choice(directions).rotate(uniform(-SEARCH_ANGLE_JITTER, SEARCH_ANGLE_JITTER))
+                power = uniform(*SEARCH_POWER_RANGE)
+            count += 1
+
+            outcome = Simulation.simulate_shot(table_state, direction, power, self.solver)
+            value = self.score_outcome(outcome)
+            if best is None or value > best[2]:
+                best = (direction, power, value)
+        return best
+
+    def step_search_shot(self) -> bool:
+        search_result = self.search_shot()
+        if search_result is None:
+            return False
+        
+        self.shot_type = 'searched shot'
+        self.direction, self.power, _ = search_result
+        return True
+
     def is_pos_free(self, pos: Vector2) -> bool:
         # check if no ball around
         for ball in Ball._reg:
@@ -168,8 +370,8 @@ class PlayerCpu:
 
         return True
 
-    def step_mouse_in_hand(self):
-        cue_new_pos = Vector2()
+    def get_cue_position(self) -> Vector2:
+        ''' a free cue ball position from which a valid ball can be potted, None if there is none '''
         available_positions: List[Tuple[Ball, Hole, Vector2]] = []
         for ball in Ball._reg:
             if not self.check_ball_validity(ball):
@@ -191,108 +393,208 @@ class PlayerCpu:
 
         # choose from available positions
         if len(available_positions) == 0:
-            return
+            return None
+
+        return choice(available_positions)[2]
 
-        cue_new_pos = choice(available_positions)[2]
+    def get_free_cue_position(self) -> Vector2:
+        ''' any free cue ball position, for when no pot can be set up from the hand '''
+        dims = self.game_state.table_dims
+        step = Ball._radius * 4
+        free_positions = []
+        y = dims['top'] + step
+        while y < dims['bottom']:
+            x = dims['left'] + step
+            while x < dims['right']:
+                pos = Vector2(x, y)
+                if self.is_pos_free(pos):
+                    free_positions.append(pos)
+                x += step
+            y += step
+        if len(free_positions) == 0:
+            return None
+        return choice(free_positions)
+
+    def step_mouse_in_hand(self):
+        cue_new_pos = self.plan.cue_pos
+        if cue_new_pos is None:
+            return
 
         self.shot_type = 'ball in hand'
 
+        if self.recorder is not None:
+            self.recorder.place(cue_new_pos)
         cue_ball = Ball._cue_ball
         if cue_ball.is_out:
             cue_ball = CueBall(cue_new_pos)
         else:
             cue_ball.set_pos(cue_new_pos)
+        self.plan = None
         self.game_state.update()
 
     def pre_step(self):
         ...
 
-    def step(self): 
+    def plan_turn(self) -> Plan:
+        ''' decide the turn for the table as it is now '''
         self.targets = []
         self.best_target = None
+        self.direction = None
+        self.shot_type = None
 
         self.pre_step()
 
-        # check for current turn
-        if not self.game_state.get_player() == self.player:
-            return
-        
-        if not (self.game_state.get_state() in [State.PLAY, State.MOVING_CUE_BALL]):
-            return
-
         # check for mouse in hand turn
         if self.game_state.get_state() == State.MOVING_CUE_BALL:
-            self.step_mouse_in_hand()
-            return
+            cue_pos = self.get_cue_position()
+            if cue_pos is None:
+                cue_pos = self.get_free_cue_position()
+            return Plan(None, None, self.power, cue_pos=cue_pos)
 
-        # try to break shot
-        if self.step_brake_shoot():
-            self.play_turn()
-            return
-
-        # try a regular shot
-        if self.step_shoot_ball():
-            self.play_turn()
-            return
-        
+        # try to break shot, then a simulated shot, then a regular shot
         # try to bank shot
         # TODO
+        # then try to touch ball
+        if not (self.step_brake_shoot() or
+                (self.search_budget is not None and self.step_search_shot()) or
+                self.step_shoot_ball() or
+                self.step_touch() or
+                self.step_snookered()):
+            self.direction = None
+
+        best_target = None
+        if self.best_target:
+            best_target = (self.best_target[0].pos, self.best_target[1].target_pos)
+        return Plan(self.shot_type, self.direction, self.power, targets=self.targets, best_target=best_target)
 
-        # try to touch ball
-        if self.step_touch():
-            self.play_turn()
+    def start_planner(self):
+        dims = self.game_state.table_dims
+        table_center = (dims['center'], (dims['top'] + dims['bottom']) / 2)
+        self.planner = Pool(1, initializer=_init_planner, initargs=(self, table_center, dims['right'] - dims['center']))
+
+    def get_plan(self) -> Plan:
+        ''' the plan for the current table, None while it is still being made in the background '''
+        if not self.background:
+            return self.plan_turn()
+        
+        if self.pending is None:
+            if self.planner is None:
+                self.start_planner()
+            self.pending = self.planner.apply_async(_plan_task, (self.game_state, TableState.capture()))
+            return None
+        if not self.pending.ready():
+            return None
+        plan = self.pending.get()
+        self.pending = None
+        return plan
+
+    def close(self):
+        if self.planner is not None:
+            self.planner.terminate()
+            self.planner.join()
+            self.planner = None
+
+    def __getstate__(self):
+        # the planner process stays with the game
+        state = self.__dict__.copy()
+        state['planner'] = None
+        state['pending'] = None
+        state['recorder'] = None
+        return state
+
+    def step(self): 
+        self.pre_step()
+
+        # check for current turn
+        if not (self.game_state.get_player() == self.player and
+                self.game_state.get_state() in [State.PLAY, State.MOVING_CUE_BALL]):
+            self.targets = []
+            self.best_target = None
+            return
+
+        if self.plan is None:
+            self.plan = self.get_plan()
+            if self.plan is None:
+                # the countdown runs while planning
+                self.timer += 1
+                return
+            self.shot_type = self.plan.shot_type
+            self.direction = self.plan.direction
+            self.power = self.plan.power
+            self.targets = self.plan.targets
+            self.best_target = self.plan.best_target
+
+        # check for mouse in hand turn
+        if self.game_state.get_state() == State.MOVING_CUE_BALL:
+            self.step_mouse_in_hand()
             return
 
-        self.direction = None
         self.play_turn()
 
-    def adjust_dificulty(self):
+    def adjust_dificulty(self) -> bool:
+        ''' spoil the shot now and then below the top dificulty, True if it was '''
         if not randint(1, 3) <= self.dificulty:
             # bad shot
             adj = 0.1
             adjust_vec = Vector2(uniform(-adj, adj), uniform(-adj, adj))
             self.direction += adjust_vec
-            print('bad shot')
+            return True
+        return False
 
     def play_turn(self):
         self.timer += 1
-        if self.timer >= 60 * 3:
+        if self.timer >= self.turn_delay:
             self.timer = 0
-            if self.shot_type:
-                print(f'[CPU] {self.shot_type}')
-                self.shot_type = None
+            shot_type, self.shot_type = self.shot_type, None
             if self.direction == None:
-                print('cant play')
+                events.emit(Event.CPU_NO_SHOT, player=self.player)
+                self.plan = None
                 return
-            self.adjust_dificulty()
+            bad_shot = self.adjust_dificulty()
+            events.emit(Event.CPU_SHOT, player=self.player, shot_type=shot_type, dificulty=self.dificulty, bad_shot=bad_shot)
+            self.plan = None
+            if self.recorder is not None:
+                self.recorder.shot(self.direction, self.power)
             Ball._cue_ball.strike(self.direction, self.power)
             self.game_state.update()
 
-    def draw(self):
+    def draw(self) -> List[pygame.Rect]:
+        rects = []
         if not self.debug:
-            return
+            return rects
         for target in self.targets:
-            pygame.draw.circle(win, (0,255,0), target[0], 4)
-            pygame.draw.circle(win, (0,255,0), target[1], 4)
-            pygame.draw.line(win, (0,255,0), target[0], target[1])
+            rects.append(pygame.draw.circle(win, (0,255,0), target[0], 4))
+            rects.append(pygame.draw.circle(win, (0,255,0), target[1], 4))
+            rects.append(pygame.draw.line(win, (0,255,0), target[0], target[1]))
         if self.best_target:
-            pygame.draw.circle(win, (0,0,255), self.best_target[0].pos, 4)
-            pygame.draw.circle(win, (0,0,255), self.best_target[1].target_pos, 4)
-            pygame.draw.line(win, (0,0,255), self.best_target[0].pos, self.best_target[1].target_pos)
+            rects.append(pygame.draw.circle(win, (0,0,255), self.best_target[0], 4))
+            rects.append(pygame.draw.circle(win, (0,0,255), self.best_target[1], 4))
+            rects.append(pygame.draw.line(win, (0,0,255), self.best_target[0], self.best_target[1]))
+        return rects
 
 
 class PlayerCpuEightBall(PlayerCpu):
-    def __init__(self, game_state: GameState, player: Player, dificulty=3):
-        super().__init__(game_state, player, dificulty)
+    def __init__(self, game_state: GameState, player: Player, dificulty=3, search_budget: float=None, solver: Solver=Solver.FIXED_STEP, background: bool=False):
+        super().__init__(game_state, player, dificulty, search_budget, solver, background)
         self.determined = False
         self.ball_type = BallType.BALL_NONE
     
+    def target_ball_type(self) -> BallType:
+        '''
+        the type this cpu has to hit first in the game state it plans against, BALL_NONE on an open table.
+        worked out every time and never stored, the game state may be a hypothetical one
+        '''
+        game_state = self.game_state
+        if not game_state.player_determined:
+            return BallType.BALL_NONE
+        if game_state.score[self.player] == 7:
+            return BallType.BALL_BLACK
+        return game_state.player_ball_type[self.player]
+
     def check_ball_validity(self, ball: Ball) -> bool:
-        if self.determined and self.game_state.is_current_player_finished():
-            self.ball_type = BallType.BALL_BLACK
-        
-        if self.determined:
-            if self.ball_type != ball.get_type():
+        target = self.target_ball_type()
+        if target != BallType.BALL_NONE:
+            if target != ball.get_type():
                 return False
         else:
             if ball.get_type() == BallType.BALL_BLACK:
@@ -307,9 +609,9 @@ class PlayerCpuEightBall(PlayerCpu):
             self.determined = True
 
 class PlayerCpuSnooker(PlayerCpu):
-    def __init__(self, game_state: GameState, player: Player, dificulty=3):
+    def __init__(self, game_state: GameState, player: Player, dificulty=3, search_budget: float=None, solver: Solver=Solver.FIXED_STEP, background: bool=False):
 
-        super().__init__(game_state, player, dificulty)
+        super().__init__(game_state, player, dificulty, search_budget, solver, background)
 
     def check_ball_validity(self, ball: Ball) -> bool:
         if ball is Ball._cue_ball:
@@ -0,0 +1,239 @@
+'''
+event driven physics solver. instead of fixed substeps, finds the exact time of the next
+ball-ball, ball-cushion, ball-pocket or rest event and jumps to it analytically
+'''
+
+import numpy as np
+from math import log, inf, ceil
+from typing import Tuple
+from enum import Enum
+from Physics import Ball, Line, Hole, FRICTION, REST_THRESHOLD, SUBSTEPS
+
+# time is measured in substeps. with no events, a ball moving with vel travels vel * travel(t) in t substeps,
+# which matches the fixed step friction model (vel *= FRICTION, pos += vel) at whole substeps
+LOG_FRICTION = log(FRICTION)
+TRAVEL_LIMIT = FRICTION / (1.0 - FRICTION)
+MAX_EVENTS_PER_FRAME = 1000
+MAX_EVENTS_TO_REST = 100000
+
+class Event(Enum):
+    BALL_BALL = 0
+    BALL_LINE = 1
+    BALL_HOLE = 2
+    BALL_REST = 3
+
+def travel(duration: float) -> float:
+    if duration == inf:
+        return TRAVEL_LIMIT
+    return TRAVEL_LIMIT * (1.0 - FRICTION ** duration)
+
+def time_for_travel(distance: float) -> float:
+    ''' inverse of travel, inf if the balls stop before covering the distance '''
+    arg = 1.0 - distance / TRAVEL_LIMIT
+    if arg <= 0:
+        return inf
+    return log(arg) / LOG_FRICTION
+
+class Cushions:
+    ''' numpy copy of the cushion index, for testing all balls against all lines at once '''
+    def __init__(self):
+        index = Line._index
+        self.starts = np.array(index.starts).reshape(-1, 2)
+        self.edges = np.array(index.edges).reshape(-1, 2)
+        self.ends = self.starts + self.edges
+        self.normals = np.array(index.normals).reshape(-1, 2)
+        self.lengths_squared = np.array(index.lengths_squared)
+        self.holes = np.array([(hole.pos[0], hole.pos[1]) for hole in Hole._reg]).reshape(-1, 2)
+        # the reach of the pull of Hole.step, a ball that gets inside it is drawn in by the fixed step
+        self.hole_radii = np.array([hole.radius + 0.5 * Ball._radius for hole in Hole._reg])
+        self.source = (index, len(Hole._reg))
+
+_cushions: Cushions = None
+
+def get_cushions() -> Cushions:
+    global _cushions
+    if Line._index is None:
+        Line.build_index()
+    if _cushions is None or _cushions.source != (Line._index, len(Hole._reg)):
+        _cushions = Cushions()
+    return _cushions
+
+def first_contact(delta: np.ndarray, rel_vel: np.ndarray, radius: float) -> np.ndarray:
+    '''
+    travel until |delta + rel_vel * s| == radius for approaching pairs, inf otherwise.
+    overlapping and approaching pairs collide right away
+    '''
+    a = np.einsum('...k,...k->...', rel_vel, rel_vel)
+    b = np.einsum('...k,...k->...', delta, rel_vel)
+    distance_squared = np.einsum('...k,...k->...', delta, delta)
+    c = distance_squared - radius * radius
+    disc = b * b - a * c
+    # closing speeds under the rest threshold would be zeroed right after the exchange, so they never collide
+    hit = (b < -REST_THRESHOLD * np.sqrt(distance_squared)) & (disc >= 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(c <= 0, 0.0, (-b - np.sqrt(np.maximum(disc, 0.0))) / a)
+    return np.where(hit, s, inf)
+
+def next_ball_event(pos: np.ndarray, vel: np.ndarray, moving: np.ndarray) -> Tuple:
+    # moving balls against every ball, a pair of two resting balls can't collide
+    delta = pos[np.newaxis, :, :] - pos[moving, np.newaxis, :]
+    rel_vel = vel[np.newaxis, :, :] - vel[moving, np.newaxis, :]
+    s = first_contact(delta, rel_vel, Ball._radius * 2)
+    s[np.arange(len(moving)), moving] = inf
+    m, j = np.unravel_index(np.argmin(s), s.shape)
+    return s[m, j], (int(moving[m]), int(j))
+
+def next_line_event(pos: np.ndarray, vel: np.ndarray, moving: np.ndarray, cushions: Cushions) -> Tuple:
+    reach = Ball._radius + Line._radius
+    pos = pos[moving]
+    vel = vel[moving]
+    rel = pos[:, np.newaxis, :] - cushions.starts[np.newaxis, :, :]
+
+    # flat side of the capsule, on whichever side the ball is
+    height = np.einsum('blk,lk->bl', rel, cushions.normals)
+    rate = vel @ cushions.normals.T
+    side = np.where(height < 0, -1.0, 1.0)
+    height *= side
+    rate *= side
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s_side = np.where(rate < -REST_THRESHOLD, np.maximum(height - reach, 0.0) / -rate, inf)
+        hit_pos = rel + vel[:, np.newaxis, :] * np.where(np.isfinite(s_side), s_side, 0.0)[:, :, np.newaxis]
+        along = np.einsum('blk,lk->bl', hit_pos, cushions.edges)
+    s_side = np.where((along >= 0) & (along <= cushions.lengths_squared), s_side, inf)
+
+    # round ends
+    s_start = first_contact(rel, vel[:, np.newaxis, :], reach)
+    s_end = first_contact(pos[:, np.newaxis, :] - cushions.ends[np.newaxis, :, :], vel[:, np.newaxis, :], reach)
+
+    s = np.minimum(s_side, np.minimum(s_start, s_end))
+    m, l = np.unravel_index(np.argmin(s), s.shape)
+    return s[m, l], (int(moving[m]), int(l))
+
+def next_hole_event(pos: np.ndarray, vel: np.ndarray, moving: np.ndarray, cushions: Cushions) -> Tuple:
+    # the pull of the pocket is folded into capturing a ball as soon as its center is within its reach
+    delta = pos[moving, np.newaxis, :] - cushions.holes[np.newaxis, :, :]
+    s = first_contact(delta, vel[moving, np.newaxis, :], cushions.hole_radii)
+    m, h = np.unravel_index(np.argmin(s), s.shape)
+    return s[m, h], (int(moving[m]), int(h))
+
+def next_rest_event(vel: np.ndarray) -> Tuple:
+    speed = np.abs(vel)
+    with np.errstate(divide='ignore'):
+        t = np.where(speed > 0, np.log(REST_THRESHOLD / speed) / LOG_FRICTION, inf)
+    k = np.unravel_index(np.argmin(t), t.shape)
+    return max(t[k], 0.0), (int(k[0]), int(k[1]))
+
+def move(duration: float):
+    arrays = Ball._arrays
+    arrays.pos += arrays.vel * travel(duration)
+    arrays.vel *= 0.0 if duration == inf else FRICTION ** duration
+    # anything that reached the rest threshold stops, same as the fixed step
+    arrays.vel[np.abs(arrays.vel) < REST_THRESHOLD * (1.0 + 1e-9)] = 0.0
+
+def resolve_ball_ball(i: int, j: int):
+    arrays = Ball._arrays
+    normal = arrays.pos[j] - arrays.pos[i]
+    distance = np.hypot(*normal)
+    if distance == 0:
+        return
+    normal /= distance
+    exchange = (arrays.vel[j] - arrays.vel[i]) @ normal
+    arrays.vel[i] += exchange * normal
+    arrays.vel[j] -= exchange * normal
+    Ball.record_touch(Ball._reg[i], Ball._reg[j])
+
+def line_normal(point: np.ndarray, l: int, cushions: Cushions) -> np.ndarray:
+    ''' unit normal of line l towards point, from the closest point of the segment. None on the line itself '''
+    rel = point - cushions.starts[l]
+    t = min(max(rel @ cushions.edges[l], 0.0), cushions.lengths_squared[l]) / cushions.lengths_squared[l]
+    normal = rel - t * cushions.edges[l]
+    distance = np.hypot(*normal)
+    if distance == 0:
+        return None
+    return normal / distance
+
+def resolve_ball_line(b: int, l: int, cushions: Cushions):
+    arrays = Ball._arrays
+    normal = line_normal(arrays.pos[b], l, cushions)
+    if normal is None:
+        return
+    dot_normal = arrays.vel[b] @ normal
+    if dot_normal < 0:
+        arrays.vel[b] -= 2 * dot_normal * normal
+
+def advance(duration: float, max_events: int=MAX_EVENTS_PER_FRAME) -> int:
+    '''
+    move the table forward by duration substeps, inf runs until every ball is at rest.
+    returns the number of events resolved
+    '''
+    for ball in Ball._ball_to_remove:
+        ball.potted()
+    Ball._ball_to_remove.clear()
+
+    arrays = Ball._arrays
+    arrays.vel += arrays.acc
+    arrays.acc[:] = 0.0
+
+    cushions = get_cushions()
+    events = 0
+    while duration > 0 and arrays.vel.any():
+        if events >= max_events:
+            # stuck resolving contacts in a cluster, the fixed step gets the balls out of it without passing through
+            fixed_substeps(duration, cushions)
+            break
+
+        pos, vel = arrays.pos, arrays.vel
+        moving = np.flatnonzero(vel.any(axis=1))
+        s_ball, ball_pair = next_ball_event(pos, vel, moving)
+        s_line, ball_line = next_line_event(pos, vel, moving, cushions)
+        s_hole, ball_hole = next_hole_event(pos, vel, moving, cushions)
+        t_rest, _ = next_rest_event(vel[moving])
+
+        kind, s = min(((Event.BALL_BALL, s_ball), (Event.BALL_LINE, s_line), (Event.BALL_HOLE, s_hole)), key=lambda e: e[1])
+        t = time_for_travel(s)
+        if t_rest < t:
+            kind, t = Event.BALL_REST, t_rest
+
+        if t >= duration:
+            move(duration)
+            break
+
+        move(t)
+        if duration != inf:
+            duration -= t
+        events += 1
+
+        match kind:
+            case Event.BALL_BALL:
+                resolve_ball_ball(*ball_pair)
+            case Event.BALL_LINE:
+                resolve_ball_line(*ball_line, cushions)
+            case Event.BALL_HOLE:
+                Ball._reg[ball_hole[0]].potted()
+
+    arrays.stable = ~arrays.vel.any(axis=1)
+    return events
+
+def fixed_substeps(duration: float, cushions: Cushions):
+    ''' the rest of duration in whole fixed step substeps, rounded up, with contacts resolved the fixed step way '''
+    arrays = Ball._arrays
+    substeps = 0
+    while (duration == inf or substeps < ceil(duration)) and arrays.vel.any():
+        arrays.step()
+        Ball.resolve_line_collision()
+        Ball.resolve_ball_collisions()
+        substeps += 1
+
+        # pockets as events do it, a center within the reach of a hole is potted
+        delta = arrays.pos[:, np.newaxis, :] - cushions.holes[np.newaxis, :, :]
+        over = (np.einsum('bhk,bhk->bh', delta, delta) < cushions.hole_radii ** 2).any(axis=1)
+        for ball in [Ball._reg[i] for i in np.flatnonzero(over)]:
+            ball.potted()
+
+def step_balls():
+    ''' one frame worth of simulation, the event driven counterpart of Ball.step_balls '''
+    advance(SUBSTEPS)
+
+def settle() -> int:
+    ''' jump straight to the moment the table comes to rest '''
+    return advance(inf, MAX_EVENTS_TO_REST)
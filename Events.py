@@ -0,0 +1,141 @@
+'''
+game event stream. the rules, physics and cpus emit typed events (shots, pots, fouls, turn changes) into the
+module level stream, which hands them to a sink: nothing by default, a buffered json lines file for analytics
+or a ring buffer of the latest events. while the sink is the null sink emitting is a single flag check, hot
+paths check events.enabled themselves so not even the fields are built
+'''
+
+import json
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from time import perf_counter
+from typing import Dict, List, TextIO
+
+RING_SIZE = 1024
+FLUSH_EVENTS = 512 # a file sink writes when this many events are waiting
+FLUSH_INTERVAL = 1.0 # or when the oldest waiting event is this old, in seconds
+
+class Event(Enum):
+    BALL_PLACED = 0
+    SHOT = 1
+    POT = 2
+    FOUL = 3
+    TURN_CHANGE = 4
+    GAME_OVER = 5
+    CPU_SHOT = 6
+    CPU_NO_SHOT = 7
+
+class GameEvent:
+    def __init__(self, kind: Event, time: float, fields: Dict):
+        self.kind = kind
+        self.time = time # seconds since the stream started
+        self.fields = fields
+
+    def __repr__(self):
+        return f'GameEvent({self.kind.name}, {self.time:.3f}, {self.fields})'
+
+    def to_dict(self) -> Dict:
+        ''' enums by name, so an event is plain json '''
+        event = {'event': self.kind.name, 'time': round(self.time, 6)}
+        for key, value in self.fields.items():
+            if isinstance(value, (list, tuple)):
+                event[key] = [item.name if isinstance(item, Enum) else item for item in value]
+            else:
+                event[key] = value.name if isinstance(value, Enum) else value
+        return event
+
+class NullSink:
+    ''' drops everything, the stream does not even call it '''
+    def write(self, event: GameEvent):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class FileSink:
+    ''' json lines, batched so a headless run does not pay for a write per event '''
+    def __init__(self, path_or_file, flush_events: int=FLUSH_EVENTS, flush_interval: float=FLUSH_INTERVAL):
+        if isinstance(path_or_file, str):
+            self.file: TextIO = open(path_or_file, 'w')
+            self.owns_file = True
+        else:
+            self.file = path_or_file
+            self.owns_file = False
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.pending: List[GameEvent] = []
+
+    def write(self, event: GameEvent):
+        self.pending.append(event)
+        if len(self.pending) >= self.flush_events or event.time - self.pending[0].time >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.file.write(''.join(json.dumps(event.to_dict()) + '\n' for event in self.pending))
+        self.file.flush()
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+
+class RingBufferSink:
+    ''' the latest events in memory, the oldest are dropped '''
+    def __init__(self, size: int=RING_SIZE):
+        self.events: deque = deque(maxlen=size)
+
+    def write(self, event: GameEvent):
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def of_kind(self, kind: Event) -> List[GameEvent]:
+        return [event for event in self.events if event.kind == kind]
+
+class EventStream:
+    def __init__(self):
+        self.sink = NullSink()
+        self.enabled = False
+        self.origin = perf_counter()
+
+    def set_sink(self, sink) -> object:
+        ''' route events to sink, returns the sink it replaces, which is left open '''
+        previous = self.sink
+        self.sink = sink
+        self.enabled = not isinstance(sink, NullSink)
+        return previous
+
+    def emit(self, kind: Event, **fields):
+        if not self.enabled:
+            return
+        self.sink.write(GameEvent(kind, perf_counter() - self.origin, fields))
+
+    @contextmanager
+    def muted(self):
+        ''' nothing is emitted inside, for hypothetical shots of the cpu planning '''
+        enabled = self.enabled
+        self.enabled = False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        ''' close the sink and go back to the null sink '''
+        self.set_sink(NullSink()).close()
+
+events = EventStream()
@@ -1,14 +1,82 @@
 
 from StateMachine import GameState, State, Player
 from typing import Tuple, List
-from Physics import Ball, Line
-from Calc import find_collision_centers_on_line, find_collision_position_ball_to_line
+from Physics import Ball
 import pygame
 from pygame.math import Vector2
-from math import radians
+from time import perf_counter
+from collections import OrderedDict
+from RayCast import RayIndex, Hit
 
 win = None
 
+# trajectory preview
+AIM_STEP = 0.1 # degrees, the aim is quantized so a still mouse keeps its cast path
+MAX_EVENTS = 6 # cushion bounces and ball deflections of the cue ball
+PATH_LENGTH = 1500.0
+CAST_BUDGET = 0.002 # seconds per frame
+PATH_CACHE_SIZE = 16
+
+class Trajectory:
+    '''
+    predicted path of the cue ball through cushion bounces and ball deflections, and of the first ball it hits,
+    with the contact geometry of the physics. other balls stay put. cast a few events at a time with advance
+    '''
+    def __init__(self, start: Vector2, direction: Vector2):
+        self.index = RayIndex(Ball._arrays.pos.tolist())
+        self.cue_index = Ball._cue_ball.index
+
+        self.cue_path: List[Vector2] = [Vector2(start)]
+        self.object_path: List[Vector2] = []
+        self.ghost: Vector2 = None
+        # rays still being cast: path, position, direction, length left, events left, index of the ball
+        self.casts = [(self.cue_path, tuple(start), tuple(direction), PATH_LENGTH, MAX_EVENTS, self.cue_index)]
+
+    def is_done(self) -> bool:
+        return len(self.casts) == 0
+
+    def advance(self, deadline: float):
+        while self.casts and perf_counter() < deadline:
+            self.step(*self.casts.pop())
+
+    def step(self, path: List[Vector2], pos: Tuple[float, float], direction: Tuple[float, float], length: float, events: int, index: int):
+        ''' cast one ray to its next event '''
+        # the ball casting and the cue ball at its start are not in the way
+        hit = self.index.cast(pos, direction, length, {index, self.cue_index})
+        s, kind, j = hit if hit is not None else (length, None, None)
+        pos = (pos[0] + direction[0] * s, pos[1] + direction[1] * s)
+        path.append(Vector2(pos))
+        length -= s
+        events -= 1
+        if kind is None or kind == Hit.HOLE or events < 0:
+            # rolled out or potted
+            return
+
+        if kind == Hit.LINE:
+            normal = self.index.line_normal(pos, j)
+            if normal is not None:
+                dot = direction[0] * normal[0] + direction[1] * normal[1]
+                direction = (direction[0] - 2 * dot * normal[0], direction[1] - 2 * dot * normal[1])
+            self.casts.append((path, pos, direction, length, events, index))
+            return
+
+        if index != self.cue_index:
+            # the object ball would pass it on to the next, its path ends here
+            return
+
+        # ball contact, same exchange as the physics: the object ball takes the normal part, the cue keeps the tangent
+        target = self.index.positions[j]
+        normal = Vector2(target[0] - pos[0], target[1] - pos[1]).normalize()
+        along = normal.dot(direction)
+        tangent = Vector2(direction) - along * normal
+        if self.ghost is None:
+            self.ghost = Vector2(pos)
+            self.object_path.append(Vector2(target))
+            self.casts.append((self.object_path, tuple(target), tuple(normal), length * along, events, j))
+        speed = tangent.length()
+        if speed > 0:
+            self.casts.append((path, pos, tuple(tangent / speed), length * speed, events, index))
+
 class AimGuide:
     def __init__(self, game_state: GameState, cpu_players: List[Player]):
         self.powering = False
@@ -20,6 +88,25 @@ class AimGuide:
         self.cpu_aim: Vector2 = None
 
         self.draw_points: List[Vector2] = []
+        self.paths: OrderedDict = OrderedDict()
+
+    def get_trajectory(self, vec: Vector2) -> Trajectory:
+        ''' cast path for the quantized aim, kept while the aim and the balls stay put '''
+        cue_ball = Ball._cue_ball
+        if vec == Vector2(0,0) or cue_ball.index is None:
+            return None
+        angle = round(vec.as_polar()[1] / AIM_STEP)
+        key = (angle, Ball._arrays.pos.tobytes())
+        trajectory = self.paths.get(key)
+        if trajectory is None:
+            trajectory = Trajectory(cue_ball.pos, Vector2(1, 0).rotate(angle * AIM_STEP))
+            self.paths[key] = trajectory
+            if len(self.paths) > PATH_CACHE_SIZE:
+                self.paths.popitem(last=False)
+        else:
+            self.paths.move_to_end(key)
+        trajectory.advance(perf_counter() + CAST_BUDGET)
+        return trajectory
     
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -40,7 +127,8 @@ class AimGuide:
     def set_aim(self, aim: Vector2):
         self.cpu_aim = aim
 
-    def draw(self):
+    def draw(self) -> List[pygame.Rect]:
+        rects = []
         cue_ball = Ball._cue_ball
         target = pygame.mouse.get_pos()
         if self.game_state.get_player() in self.cpu_players:
@@ -57,63 +145,32 @@ class AimGuide:
         except ValueError:
             vec_normalized = Vector2(0,0)
         
-        # guide points is ghost position
-        guide_points = []
-
-        # test guides with balls
-        for ball in Ball._reg:
-            if ball is cue_ball:
-                continue
-            
-            ghost = find_collision_centers_on_line(ball.pos, cue_ball.pos, vec_normalized, Ball._radius)
-            if not ghost:
-                continue
-            guide_points.append({'pos': ghost, 'ball': ball, 'line': None})
-
-        # test guides with lines
-        for line in Line._reg:
-            ghost = find_collision_position_ball_to_line(line.start, line.end, cue_ball.pos, cue_ball.pos + vec, Ball._radius, Line._radius)
-            if not ghost:
-                continue
-            guide_points.append({'pos': ghost, 'ball': None, 'line': line})
-
-
         # claculate power
         power = 0.0
         if self.powering:
             power = min(target.distance_to(pygame.mouse.get_pos()), 400.0) / 400.0
 
-        if len(guide_points) > 0:
-            guide = min(guide_points, key=lambda p: cue_ball.pos.distance_squared_to(p['pos']))
-            ghost_pos: Vector2 = guide['pos']
-            pygame.draw.circle(win, (255,255,0), ghost_pos, Ball._radius, 1)
-            # draw collision guide with line
-            pygame.draw.line(win, (255,255,0), cue_ball.pos, ghost_pos)
-            if guide['ball'] is not None:
-                # draw bounce target ball
-                ball: Ball = guide['ball']
-                target_bounce_vec = (ball.pos - ghost_pos).normalize()
-                target_bounce_strength = (ghost_pos - cue_ball.pos).normalize().dot(target_bounce_vec)
-                pygame.draw.line(win, (255,255,0), ball.pos, ghost_pos + target_bounce_vec * 100 * target_bounce_strength)
-                ghost_bounce_vec = max([Vector2(-target_bounce_vec.y, target_bounce_vec.x), Vector2(target_bounce_vec.y, -target_bounce_vec.x)], key=lambda x: x.dot(target - cue_ball.pos))
-                ghost_bounce_strength = 1 - target_bounce_strength
-                pygame.draw.line(win, (255,255,0), ghost_pos, ghost_pos + ghost_bounce_vec * 100 * ghost_bounce_strength)
-
-            elif guide['line'] is not None:
-                line: Line = guide['line']
-                # todo: reflect the line and draw
+        trajectory = self.get_trajectory(vec)
+        if trajectory is not None:
+            if len(trajectory.cue_path) > 1:
+                rects.append(pygame.draw.lines(win, (255,255,0), False, trajectory.cue_path))
+            if trajectory.ghost is not None:
+                rects.append(pygame.draw.circle(win, (255,255,0), trajectory.ghost, Ball._radius, 1))
+            if len(trajectory.object_path) > 1:
+                rects.append(pygame.draw.lines(win, (255,255,0), False, trajectory.object_path))
         
         # draw cue
-        draw_cue(vec_normalized, power)
+        rects.append(draw_cue(vec_normalized, power))
 
         # draw points
         for point in self.draw_points:
-            pygame.draw.circle(win, (255,0,0), point, 5)
-            pygame.draw.circle(win, (255,0,0), point, Ball._radius, 1)
+            rects.append(pygame.draw.circle(win, (255,0,0), point, 5))
+            rects.append(pygame.draw.circle(win, (255,0,0), point, Ball._radius, 1))
         self.draw_points.clear()
+        return rects
 
-def draw_cue(dir, power):
+def draw_cue(dir, power) -> pygame.Rect:
     # dir should be normalized
     s = Ball._cue_ball.pos - dir * Ball._radius - dir * power * 100
     e = Ball._cue_ball.pos - dir * Ball._radius * 20 - dir * power * 100
-    pygame.draw.line(win, (82, 50, 16), s, e, 3)
+    return pygame.draw.line(win, (82, 50, 16), s, e, 3)
@@ -5,22 +5,70 @@ Main module
 import pygame
 from pygame.math import Vector2
 import os
-from random import shuffle, choice
+from random import choice
+from contextlib import contextmanager
 from typing import Dict, Tuple, List
 import Physics
-from Physics import Ball, Line, Hole, CueBall
+from Physics import Ball, Line, Hole, CueBall, Solver
+import Simulation
+import Table
 from Calc import *
 from StateMachine import *
 import Cpu
+import Mcts
 import Guide
 from Guide import AimGuide
+import Render
+from Render import RenderMode
+from Replay import ReplayRecorder
+from Profiler import profiler
+from Events import events
 
 DEBUG = False
 
+# game time runs in fixed ticks of one physics frame, whatever the render rate
+TICK_RATE = 60
+MAX_TICKS_PER_FRAME = 8 # a stalled frame drops game time instead of spiralling
+FAST_FORWARD_TICKS = 20 # ticks per rendered frame while the balls settle in fast forward
+
+def create_cpus(rules: Rules, game_state: GameState, cpu_config: Dict[Player, Tuple[Player_Type, int]], solver: Solver=Solver.FIXED_STEP, background: bool=False) -> List[Cpu.PlayerCpu]:
+    ''' the cpu players of cpu_config, humans have none '''
+    cpus = []
+    for key in cpu_config:
+        # an optional third value is the shot search budget of the cpu, in seconds per turn
+        player_type, dificulty, *search = cpu_config[key]
+        search_budget = search[0] if search else None
+        if player_type == Player_Type.CPU:
+            match rules:
+                case Rules.EIGHT_BALL:
+                    cpu_player = Cpu.PlayerCpuEightBall(game_state, key, dificulty=dificulty, search_budget=search_budget, solver=solver, background=background)
+                case Rules.SNOOKER:
+                    cpu_player = Cpu.PlayerCpuSnooker(game_state, key, dificulty=dificulty, search_budget=search_budget, solver=solver, background=background)
+            cpus.append(cpu_player)
+        elif player_type == Player_Type.CPU_MCTS:
+            match rules:
+                case Rules.EIGHT_BALL:
+                    cpu_player = Mcts.PlayerCpuMctsEightBall(game_state, key, dificulty=dificulty, search_budget=search_budget, solver=solver, background=background)
+                case Rules.SNOOKER:
+                    cpu_player = Mcts.PlayerCpuMctsSnooker(game_state, key, dificulty=dificulty, search_budget=search_budget, solver=solver, background=background)
+            cpus.append(cpu_player)
+    return cpus
+
 class PoolGame:
-    def __init__(self, rules: Rules, cpu_config: Dict[Player, Tuple[Player_Type, int]], win: pygame.Surface, clock: pygame.time.Clock):
+    def __init__(self, rules: Rules, cpu_config: Dict[Player, Tuple[Player_Type, int]], win: pygame.Surface, clock: pygame.time.Clock, solver: Solver=Solver.FIXED_STEP, render_mode: RenderMode=RenderMode.FULL, frame_rate: int=60, fast_forward: bool=False, recorder: ReplayRecorder=None, trace_path: str='trace.json'):
         self.win = win
         self.clock = clock
+        self.solver = solver
+        self.render_mode = render_mode
+        self.frame_rate = frame_rate # render cap, 0 for uncapped
+        self.fast_forward = fast_forward
+        self.recorder = recorder
+        self.trace_path = trace_path # the profiler trace is written here on close, if profiling was turned on
+
+        # game time not yet ticked, in ticks, and the table before the last tick for drawing in between
+        self.accumulator = 0.0
+        self.previous_reg: List[Ball] = None
+        self.previous_positions = None
 
         self.cpu_config = cpu_config
         self.pool_line = 450
@@ -39,24 +87,16 @@ class PoolGame:
         self.build_table()
         self.build_balls()
         
-        match self.rules:
-            case Rules.EIGHT_BALL:
-                self.game_state = GameStateEightBall(self.table_dims)
-            case Rules.SNOOKER:
-                self.game_state = GameStateSnooker(self.table_dims)
-
-        for key in self.cpu_config:
-            player_type, dificulty = self.cpu_config[key]
-            if player_type == Player_Type.CPU:
-                match self.rules:
-                    case Rules.EIGHT_BALL:
-                        cpu_player = Cpu.PlayerCpuEightBall(self.game_state, key, dificulty=dificulty)
-                    case Rules.SNOOKER:
-                        cpu_player = Cpu.PlayerCpuSnooker(self.game_state, key, dificulty=dificulty)
-                self.cpus.append(cpu_player)
+        self.game_state = create_game_state(self.rules, self.table_dims)
+        self.cpus = create_cpus(self.rules, self.game_state, self.cpu_config, self.solver, background=True)
 
         self.guide = AimGuide(self.game_state, [cpu.player for cpu in self.cpus])
 
+        if self.recorder is not None:
+            self.recorder.start(self.rules, self.solver, self.game_state, self.table_center, self.pool_line)
+            for cpu in self.cpus:
+                cpu.recorder = self.recorder
+
         self.load_sprites()
 
 
@@ -77,203 +117,175 @@ class PoolGame:
         if not self.sprites_loaded:
             Physics.draw_solids = True
 
+        self.table_layer = self.build_table_layer()
+        self.renderer = Render.DirtyRenderer(self.win, self.table_layer)
+
+    def build_table_layer(self) -> pygame.Surface:
+        ''' the static part of the frame in one opaque surface, rebuilt when draw_solids is toggled '''
+        layer = pygame.Surface(self.win.get_size())
+        layer.fill((30, 30, 30))
+        if self.sprites_loaded:
+            layer.blit(self.table_border_sprite, (self.table_center[0] - self.table_border_sprite.get_width() / 2, self.table_center[1] - self.table_border_sprite.get_height() / 2))
+            layer.blit(self.table_top_sprite, (self.table_center[0] - self.table_top_sprite.get_width() / 2, self.table_center[1] - self.table_top_sprite.get_height() / 2))
+        # solids are static too, the lines end up under the balls
+        for hole in Hole._reg:
+            hole.draw(layer)
+        Line.draw_lines(layer)
+        return layer.convert()
+
 
     def build_table(self):
-        # build table
-        pool_line = self.pool_line
-        pool_slit = 29
-        pool_d_slit = 36
-
-        left = self.table_center[0] - pool_line
-        right = self.table_center[0] + pool_line
-        top = self.table_center[1] - pool_line / 2
-        bottom = self.table_center[1] + pool_line / 2
-        center = self.table_center[0]
-
-        self.table_dims = {
-            'left': left,
-            'right': right,
-            'top': top,
-            'bottom': bottom,
-            'center': center,
-        }
-
-        # table lines
-        Line(Vector2(left, top + pool_d_slit), Vector2(left, bottom - pool_d_slit))
-        Line(Vector2(right, bottom - pool_d_slit), Vector2(right, top + pool_d_slit))
-        Line(Vector2(center - pool_slit, top), Vector2(left + pool_d_slit, top))
-        Line(Vector2(right - pool_d_slit, top), Vector2(center + pool_slit, top))
-        Line(Vector2(left + pool_d_slit, bottom), Vector2(center - pool_slit, bottom))
-        Line(Vector2(center + pool_slit, bottom), Vector2(right - pool_d_slit, bottom))
-
-        slit_offset = 45
-        slit_d_offset = 50
-        slit_center_offset = 10
-        Line(Vector2(left, top + pool_d_slit), Vector2(left - slit_d_offset, top + pool_d_slit - slit_d_offset))
-        Line(Vector2(left + pool_d_slit, top), Vector2(left + pool_d_slit - slit_d_offset, top - slit_d_offset))
-        Line(Vector2(right, top + pool_d_slit), Vector2(right + slit_d_offset, top + pool_d_slit - slit_d_offset))
-        Line(Vector2(right - pool_d_slit, top), Vector2(right - pool_d_slit + slit_d_offset, top - slit_d_offset))
-
-        Line(Vector2(left, bottom - pool_d_slit), Vector2(left - slit_d_offset, bottom - pool_d_slit + slit_d_offset))
-        Line(Vector2(left + pool_d_slit, bottom), Vector2(left + pool_d_slit - slit_d_offset, bottom + slit_d_offset))
-        Line(Vector2(right, bottom - pool_d_slit), Vector2(right + slit_d_offset, bottom - pool_d_slit + slit_d_offset))
-        Line(Vector2(right - pool_d_slit, bottom), Vector2(right - pool_d_slit + slit_d_offset, bottom + slit_d_offset))
-
-        Line(Vector2(center - pool_slit, top), Vector2(center - pool_slit + slit_center_offset, top - slit_offset))
-        Line(Vector2(center + pool_slit, top), Vector2(center + pool_slit - slit_center_offset, top - slit_offset))
-        Line(Vector2(center - pool_slit, bottom), Vector2(center - pool_slit + slit_center_offset, bottom + slit_offset))
-        Line(Vector2(center + pool_slit, bottom), Vector2(center + pool_slit - slit_center_offset, bottom + slit_offset))
-        Line._reg.reverse()
-
-        # build holes
-        hole_diagonal_offset = 30
-        hole_vertical_offset = 25
-        hole_radius = Ball._radius * 1.75
-        hole_d_radius = Ball._radius * 2
-        diagonal_adjust = 10
-        vertical_adjust = 23
-        Hole(Vector2(left - diagonal_adjust, top - diagonal_adjust), Vector2(hole_diagonal_offset, hole_diagonal_offset), hole_d_radius)
-        Hole(Vector2(left - diagonal_adjust, bottom + diagonal_adjust), Vector2(hole_diagonal_offset, -hole_diagonal_offset), hole_d_radius)
-        Hole(Vector2(right + diagonal_adjust, top - diagonal_adjust), Vector2(-hole_diagonal_offset, hole_diagonal_offset), hole_d_radius)
-        Hole(Vector2(right + diagonal_adjust, bottom + diagonal_adjust), Vector2(-hole_diagonal_offset, -hole_diagonal_offset), hole_d_radius)
-        Hole(Vector2(center, top - vertical_adjust), Vector2(0, hole_vertical_offset), hole_radius)
-        Hole(Vector2(center, bottom + vertical_adjust), Vector2(0, -hole_vertical_offset), hole_radius)
-    
+        self.table_dims = Table.build_table(self.table_center, self.pool_line)
 
     def build_balls(self):
-        # build balls
-        match self.rules:
-            case Rules.EIGHT_BALL:
-                numbers = [1, 2, 3, 4, 5, 6, 7, 9, 10, 11, 12, 13, 14, 15]
-                shuffle(numbers)
-
-                offx = self.table_center[0] + self.pool_line * 0.5 - 2 * Ball._radius
-                offy = self.table_center[1] + Ball._radius
-
-                ball_count = 0
-                for i in range(6):
-                    for j in range(-i, i, 2):
-                        number = numbers.pop()
-                        if ball_count == 4:
-                            numbers.append(number)
-                            number = 8
-                        ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
-                        Ball(ball_pos, number=number)
-                        ball_count += 1
-
-                ball_pos = Vector2(self.table_center[0] - self.pool_line * 0.5, self.table_center[1])
-                CueBall(ball_pos)
-
-            case Rules.NINE_BALL:
-                numbers = [2, 3, 4, 5, 6, 7, 8]
-                shuffle(numbers)
-
-                offx = self.table_center[0] + self.pool_line * 0.5 - 2 * Ball._radius
-                offy = self.table_center[1] + Ball._radius
-
-                ball_count = 0
-                for i in range(5):
-                    balls_in_col = - abs(i - 2) + 3
-                    for j in range(-balls_in_col, balls_in_col, 2):
-                        number = numbers.pop()
-                        if ball_count == 0:
-                            numbers.append(number)
-                            number = 1
-                        if ball_count == 4:
-                            numbers.append(number)
-                            number = 9
-                        ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
-                        Ball(ball_pos, number=number)
-                        ball_count += 1
-                
-                ball_pos = Vector2(self.table_center[0] - self.pool_line * 0.5, self.table_center[1])
-                CueBall(ball_pos)
-            
-            case Rules.SNOOKER:
-                offx = self.table_center[0] + self.pool_line * 0.5 - 2 * Ball._radius
-                offy = self.table_center[1] + Ball._radius
-
-                self.table_zero_pos = None
-                self.table_last_pos = None
-
-                ball_count = 0
-                for i in range(6):
-                    for j in range(-i, i, 2):
-                        number = 101
-                        ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
-                        if ball_count == 0:
-                            self.table_zero_pos = ball_pos.copy()
-                        if ball_count == 12:
-                            self.table_last_pos = ball_pos.copy()
-                        Ball(ball_pos, number=number)
-                        ball_count += 1
-                
-                Ball(self.table_center - (self.pool_line * 0.5, -self.pool_line * 0.25), number=102)
-                Ball(self.table_center - (self.pool_line * 0.5, self.pool_line * 0.25), number=103)
-                Ball(self.table_center - (self.pool_line * 0.5, 0), number=104)
-                Ball(Vector2(self.table_center), number=105)
-                Ball(self.table_zero_pos + Vector2(-Ball._radius * 2, 0), number=106)
-                Ball(self.table_last_pos + Vector2(Ball._radius * 4, 0), number=107)
-
-                ball_pos = Vector2(self.table_center[0] - self.pool_line * 0.5 - Ball._radius * 4, self.table_center[1])
-                CueBall(ball_pos)
-
-    def respot_balls(self):
-        respot_balls = self.game_state.get_respot()
-        for ball in respot_balls:
-            match ball:
-                case BallType.SNOOKER_YELLOW:
-                    Ball(self.table_center - (self.pool_line * 0.5, -self.pool_line * 0.25), number=102)
-                case BallType.SNOOKER_GREEN:
-                    Ball(self.table_center - (self.pool_line * 0.5, self.pool_line * 0.25), number=103)
-                case BallType.SNOOKER_BROWN:
-                    Ball(self.table_center - (self.pool_line * 0.5, 0), number=104)
-                case BallType.SNOOKER_BLUE:
-                    Ball(Vector2(self.table_center), number=105)
-                case BallType.SNOOKER_PINK:
-                    Ball(self.table_zero_pos + Vector2(-Ball._radius * 2, 0), number=106)
-                case BallType.SNOOKER_BLACK:
-                    Ball(self.table_last_pos + Vector2(Ball._radius * 4, 0), number=107)
+        Table.build_balls(self.rules, self.table_center, self.pool_line)
+
+    def close(self):
+        for cpu in self.cpus:
+            cpu.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if profiler.events:
+            profiler.export(self.trace_path)
+        events.flush()
+
+    def step_physics(self):
+        Simulation.step_frame(self.solver)
+
+    def tick(self):
+        ''' one fixed step of game time. everything that changes the table happens in ticks, so the game plays the same at any frame rate '''
+        self.previous_reg = list(Ball._reg)
+        self.previous_positions = Ball._arrays.pos.copy()
+        if self.recorder is not None:
+            self.recorder.tick()
+
+        with profiler.section('physics'):
+            self.step_physics()
+        if self.game_state.get_state() == State.WAIT_FOR_STABLE:
+            if Ball.check_stability():
+                # game stable, determine next turn
+                with profiler.section('GameState.update'):
+                    Simulation.end_turn(self.game_state, self.table_center, self.pool_line)
+                if self.recorder is not None:
+                    self.recorder.end_turn(self.game_state)
+
+        with profiler.section('PlayerCpu.step'):
+            for cpu in self.cpus:
+                cpu.step()
+                if cpu.player == self.game_state.get_player():
+                    self.guide.set_aim(cpu.get_direction())
+
+    def advance(self, elapsed: float) -> float:
+        ''' tick through elapsed milliseconds of game time, returns how far the table is into the next tick '''
+        if self.fast_forward and self.game_state.get_state() == State.WAIT_FOR_STABLE:
+            self.accumulator = 0.0
+            for i in range(FAST_FORWARD_TICKS):
+                self.tick()
+                if self.game_state.get_state() != State.WAIT_FOR_STABLE:
+                    break
+            return 1.0
+
+        self.accumulator = min(self.accumulator + elapsed * TICK_RATE / 1000, MAX_TICKS_PER_FRAME)
+        while self.accumulator >= 1.0:
+            self.tick()
+            self.accumulator -= 1.0
+        return self.accumulator
+
+    @contextmanager
+    def interpolated(self, alpha: float):
+        ''' draw the balls alpha of the way from their places before the last tick, unless balls came or went '''
+        arrays = Ball._arrays
+        current = arrays.pos
+        if alpha < 1.0 and self.previous_reg == Ball._reg and self.previous_positions is not None:
+            arrays.pos = self.previous_positions + (current - self.previous_positions) * alpha
+        try:
+            yield
+        finally:
+            arrays.pos = current
+
+    def draw_overlays(self) -> List[pygame.Rect]:
+        ''' everything drawn over the table, returns the rects drawn to '''
+        win = self.win
+        rects = []
+        for cpu in self.cpus:
+            rects += cpu.draw()
+
+        # draw guides
+        if self.game_state.get_state() == State.PLAY:
+            rects += self.guide.draw()
+        
+        if self.game_state.get_state() == State.MOVING_CUE_BALL:
+            rects.append(pygame.draw.circle(win, (255,255,255), pygame.mouse.get_pos(), Ball._radius, 1))
+
+        rects += self.draw_hud()
+        rects += profiler.draw(win, font1)
+        return rects
+
+    def draw_hud(self) -> List[pygame.Rect]:
+        win = self.win
+        rects = []
+        # draw entered balls
+        for i, ball in enumerate(Ball._entered_balls):
+            pos = Vector2(self.table_dims['right'] + Ball._radius * 8, Ball._radius + i * 2 * Ball._radius)
+            rects.append(win.blit(ball.surf, pos))
+
+        # temporarily display info
+        text = self.game_state.get_info()
+        player_turn_surf = font1.render(text, True, (255,255,255))
+        rects.append(win.blit(player_turn_surf, (10,10)))
+        return rects
 
     def main_loop(self):
         win = self.win
         clock = self.clock
         debug_move_ball = None
+        elapsed = 0
 
         done = False
         while not done:
             # --- Main event loop
-            for event in pygame.event.get():
-                self.guide.handle_event(event)
-                if event.type == pygame.QUIT:
-                    done = True
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_c:
-                        for cpu in self.cpus:
-                            cpu.debug = not cpu.debug
-                    if event.key == pygame.K_s:
-                        Physics.draw_solids = not Physics.draw_solids
-                    if event.key == pygame.K_DELETE:
-                        mouse_pos = Vector2(pygame.mouse.get_pos())
-                        for ball in Ball._reg:
-                            if ball.pos.distance_to(mouse_pos) < Ball._radius:
-                                ball.potted()
-                if event.type == pygame.KEYUP:
-                    debug_move_ball = None
-                if self.game_state.get_state() == State.PLAY:
-                    if event.type == pygame.MOUSEBUTTONUP:
-                        if event.button == 1:
-                            direction, power = self.guide.get_aim_power()
-                            Ball._cue_ball.strike(direction, power)
-                            self.game_state.update()
-                elif self.game_state.get_state() == State.MOVING_CUE_BALL:
-                    if event.type == pygame.MOUSEBUTTONUP:
-                        if event.button == 1:
-                            if Ball._cue_ball.is_out:
-                                Ball._cue_ball = CueBall(pygame.mouse.get_pos())
-                            else:
-                                Ball._cue_ball.set_pos(pygame.mouse.get_pos())
-                            self.game_state.update()
+            with profiler.section('events'):
+                for event in pygame.event.get():
+                    self.guide.handle_event(event)
+                    if event.type == pygame.QUIT:
+                        done = True
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_c:
+                            for cpu in self.cpus:
+                                cpu.debug = not cpu.debug
+                        if event.key == pygame.K_s:
+                            Physics.draw_solids = not Physics.draw_solids
+                            self.table_layer = self.build_table_layer()
+                            self.renderer.invalidate(self.table_layer)
+                        if event.key == pygame.K_f:
+                            self.fast_forward = not self.fast_forward
+                        if event.key == pygame.K_p:
+                            profiler.toggle()
+                        if event.key == pygame.K_DELETE:
+                            mouse_pos = Vector2(pygame.mouse.get_pos())
+                            for ball in Ball._reg:
+                                if ball.pos.distance_to(mouse_pos) < Ball._radius:
+                                    ball.potted()
+                    if event.type == pygame.KEYUP:
+                        debug_move_ball = None
+                    if self.game_state.get_state() == State.PLAY:
+                        if event.type == pygame.MOUSEBUTTONUP:
+                            if event.button == 1:
+                                direction, power = self.guide.get_aim_power()
+                                if self.recorder is not None:
+                                    self.recorder.shot(direction, power)
+                                Ball._cue_ball.strike(direction, power)
+                                self.game_state.update()
+                    elif self.game_state.get_state() == State.MOVING_CUE_BALL:
+                        if event.type == pygame.MOUSEBUTTONUP:
+                            if event.button == 1:
+                                if self.recorder is not None:
+                                    self.recorder.place(pygame.mouse.get_pos())
+                                if Ball._cue_ball.is_out:
+                                    Ball._cue_ball = CueBall(pygame.mouse.get_pos())
+                                else:
+                                    Ball._cue_ball.set_pos(pygame.mouse.get_pos())
+                                self.game_state.update()
             
             keys = pygame.key.get_pressed()
             if keys[pygame.K_ESCAPE]:
@@ -289,56 +301,19 @@ class PoolGame:
                             debug_move_ball = ball
 
             # step
-            Ball.step_balls()
-            for hole in Hole._reg:
-                hole.step()
-            if self.game_state.get_state() == State.WAIT_FOR_STABLE:
-                if Ball.check_stability():
-                    # game stable, determine next turn
-                    self.game_state.update_potted(Ball._cue_ball.get_potted_this_turn())
-                    self.game_state.first_touch = Ball._cue_ball.get_first_touch()
-                    self.game_state.update()
-                    self.respot_balls()
-                    Ball._cue_ball.new_turn()
-            
-            for cpu in self.cpus:
-                cpu.step()
-                if cpu.player == self.game_state.get_player():
-                    self.guide.set_aim(cpu.get_direction())
+            alpha = self.advance(elapsed)
             
             # draw
-            win.fill((30, 30, 30))
-            if self.sprites_loaded:
-                win.blit(self.table_border_sprite, (self.table_center[0] - self.table_border_sprite.get_width() / 2, self.table_center[1] - self.table_border_sprite.get_height() / 2))
-                win.blit(self.table_top_sprite, (self.table_center[0] - self.table_top_sprite.get_width() / 2, self.table_center[1] - self.table_top_sprite.get_height() / 2))
-
-            for hole in Hole._reg:
-                hole.draw()
-            Ball.draw_balls()
-            Line.draw_lines()
-
-            for cpu in self.cpus:
-                cpu.draw()
-
-            # draw guides
-            if self.game_state.get_state() == State.PLAY:
-                self.guide.draw()
-            
-            if self.game_state.get_state() == State.MOVING_CUE_BALL:
-                pygame.draw.circle(win, (255,255,255), pygame.mouse.get_pos(), Ball._radius, 1)
-
-            # draw entered balls
-            for i, ball in enumerate(Ball._entered_balls):
-                pos = Vector2(self.table_dims['right'] + Ball._radius * 8, Ball._radius + i * 2 * Ball._radius)
-                win.blit(ball.surf, pos)
-
-            # temporarily display info
-            text = self.game_state.get_info()
-            player_turn_surf = font1.render(text, True, (255,255,255))
-            win.blit(player_turn_surf, (10,10))
-
-            pygame.display.update()
-            clock.tick(60)
+            with self.interpolated(alpha), profiler.section('draw'):
+                if self.render_mode == RenderMode.DIRTY_RECTS:
+                    self.renderer.render(self.draw_overlays)
+                else:
+                    win.blit(self.table_layer, (0, 0))
+                    Ball.draw_balls()
+                    self.draw_overlays()
+                    pygame.display.update()
+            elapsed = clock.tick(self.frame_rate)
+            profiler.frame()
 
 
 if __name__ == '__main__':
@@ -359,9 +334,10 @@ if __name__ == '__main__':
         Player.PLAYER_2: (Player_Type.CPU, 3),
     }
 
-    game = PoolGame(Rules.SNOOKER, cpu_config=cpu_config, win=win, clock=clock)
+    game = PoolGame(Rules.SNOOKER, cpu_config=cpu_config, win=win, clock=clock, render_mode=RenderMode.DIRTY_RECTS)
     game.initialize()
     game.main_loop()
+    game.close()
 
     pygame.quit()
     
\ No newline at end of file
@@ -0,0 +1,187 @@
+'''
+monte carlo tree search cpu. plans a run of shots ahead, every node is a table the cpu is to shoot from
+and every edge a (direction, power) shot simulated headlessly. a turn that passes to the opponent ends the run
+'''
+
+import numpy as np
+from pygame.math import Vector2
+from math import log, sqrt, inf
+from time import perf_counter
+from typing import List, Tuple
+from StateMachine import GameState, Player, State
+from Physics import Ball, TableState, Solver
+from Cpu import PlayerCpu, PlayerCpuEightBall, PlayerCpuSnooker, SEARCH_POWERS, play_outcome
+import Simulation
+import Table
+
+# rollout budget per turn for each dificulty
+MCTS_ITERATIONS = {
+    1: 15,
+    2: 50,
+    3: 150,
+}
+EXPLORATION = 10.0 # on the scale of Cpu.POT_VALUE
+ACTIONS_PER_NODE = 12 # children a node may have from the start
+WIDENING = 0.5 # and visits ** WIDENING more as it is visited, up to all of its actions
+# shots of the default policy after a new node. every shot is a full simulation and the tree itself already
+# follows the run of the turn, so a longer rollout mostly spends the iterations of the lower dificulties
+ROLLOUT_SHOTS = 1
+REUSE_TOLERANCE = 0.5 # pixels, a played shot that ends this close to the simulated one keeps its subtree
+
+class MctsNode:
+    def __init__(self, game_state: GameState, table_state: TableState, parent: 'MctsNode'=None, action: Tuple[Vector2, float]=None, reward: float=0.0):
+        self.game_state = game_state
+        self.table_state = table_state
+        self.parent = parent
+        self.action = action
+        self.reward = reward # value of the shot leading here
+        self.terminal = False
+
+        self.children: List['MctsNode'] = []
+        self.untried: List[Tuple[Vector2, float]] = None # generated on the first visit
+        self.visits = 0
+        self.total = 0.0 # sum of the returns from the shot leading here on
+
+    def mean(self) -> float:
+        return self.total / self.visits
+
+    def ucb(self) -> float:
+        return self.mean() + EXPLORATION * sqrt(log(self.parent.visits) / self.visits)
+
+    def max_children(self) -> int:
+        ''' progressive widening, a node tries more of its actions the more it is visited '''
+        return ACTIONS_PER_NODE + int(self.visits ** WIDENING)
+
+    def is_expanded(self) -> bool:
+        return self.untried is not None and (len(self.untried) == 0 or len(self.children) >= self.max_children())
+
+    def best_child(self) -> 'MctsNode':
+        ''' the most visited child, the shot to play '''
+        return max(self.children, key=lambda child: (child.visits, child.mean()))
+
+    def matches(self, game_state: GameState, table_state: TableState) -> bool:
+        return (self.game_state.get_player() == game_state.get_player() and
+                self.game_state.get_state() == game_state.get_state() and
+                self.table_state.numbers == table_state.numbers and
+                np.allclose(self.table_state.positions, table_state.positions, atol=REUSE_TOLERANCE))
+
+class PlayerCpuMcts(PlayerCpu):
+    '''
+    plans with monte carlo tree search. the dificulty sets the number of iterations instead of jittering the shot,
+    search_budget caps the wall clock time of a turn
+    '''
+    def __init__(self, game_state: GameState, player: Player, dificulty=3, search_budget: float=None, solver: Solver=Solver.FIXED_STEP, background: bool=False, iterations: int=None):
+        super().__init__(game_state, player, dificulty, inf if search_budget is None else search_budget, solver, background)
+        self.iterations = MCTS_ITERATIONS[dificulty] if iterations is None else iterations
+        self.root: MctsNode = None
+        self.planned: MctsNode = None
+
+    def get_actions(self, node: MctsNode) -> List[Tuple[Vector2, float]]:
+        '''
+        every candidate direction at the plain power first, best pots first, then again at the other powers.
+        the first actions spread over the directions, widening reaches the rest
+        '''
+        with self.hypothetical(node.game_state, node.table_state):
+            directions = self.get_candidate_directions()
+        return [(direction, power) for power in SEARCH_POWERS for direction in directions]
+
+    def simulate(self, node: MctsNode, action: Tuple[Vector2, float]) -> MctsNode:
+        ''' play action from node, the child holds the table after respotting '''
+        direction, power = action
+        outcome = Simulation.simulate_shot(node.table_state, direction, power, self.solver)
+        game_state = play_outcome(node.game_state, outcome)
+        table_state = outcome.table_state
+        respot = game_state.get_respot()
+        if respot:
+            with Simulation.isolated_balls():
+                table_state.place()
+                Table.respot_balls(respot)
+                table_state = TableState.capture()
+
+        child = MctsNode(game_state, table_state, node, action, self.score_turn(node.game_state, game_state))
+        child.terminal = (game_state.get_state() != State.PLAY or game_state.get_player() != self.player or
+                          0 not in table_state.numbers)
+        return child
+
+    def select(self, node: MctsNode) -> MctsNode:
+        while not node.terminal and node.is_expanded() and node.children:
+            node = max(node.children, key=lambda child: child.ucb())
+        return node
+
+    def expand(self, node: MctsNode) -> MctsNode:
+        if node.terminal:
+            return node
+        if node.untried is None:
+            node.untried = self.get_actions(node)
+        if not node.untried:
+            node.terminal = True
+            return node
+        child = self.simulate(node, node.untried.pop(0))
+        node.children.append(child)
+        return child
+
+    def rollout(self, node: MctsNode) -> float:
+        ''' default policy, the straightest pot at the plain power for a few shots '''
+        value = 0.0
+        for i in range(ROLLOUT_SHOTS):
+            if node.terminal:
+                break
+            actions = self.get_actions(node)
+            if not actions:
+                break
+            node = self.simulate(node, actions[0])
+            value += node.reward
+        return value
+
+    def backpropagate(self, node: MctsNode, value: float):
+        while node is not None:
+            value += node.reward
+            node.total += value
+            node.visits += 1
+            node = node.parent
+
+    def get_root(self, game_state: GameState, table_state: TableState) -> MctsNode:
+        ''' the subtree of the shot played last turn if the table came out the way it was simulated '''
+        if self.planned is not None and self.planned.matches(game_state, table_state):
+            root = self.planned
+            root.parent = None
+            root.reward = 0.0
+            root.terminal = False
+            # actions of the live game state, a node left without any in the tree may have some now
+            root.untried = None
+            # the game state of the tree was simulated, keep the live one
+            root.game_state = self.game_state
+            return root
+        return MctsNode(self.game_state, table_state)
+
+    def search_shot(self) -> Tuple[Vector2, float, float]:
+        start = perf_counter()
+        self.root = self.get_root(self.game_state, TableState.capture())
+        self.planned = None
+
+        count = 0
+        while count < self.iterations and (count == 0 or perf_counter() - start < self.search_budget):
+            node = self.expand(self.select(self.root))
+            if node is self.root and node.terminal:
+                break
+            self.backpropagate(node, self.rollout(node))
+            count += 1
+
+        if not self.root.children:
+            return None
+
+        # the search ran on hypothetical tables, show the pots of the live one
+        self.targets = [(ball.pos, hole.target_pos) for ball, hole, score in self.get_pot_options(Ball._cue_ball.pos)]
+        self.planned = self.root.best_child()
+        direction, power = self.planned.action
+        return (direction, power, self.planned.mean())
+
+    def adjust_dificulty(self) -> bool:
+        # dificulty is the size of the search
+        return False
+
+class PlayerCpuMctsEightBall(PlayerCpuMcts, PlayerCpuEightBall):
+    ...
+
+class PlayerCpuMctsSnooker(PlayerCpuMcts, PlayerCpuSnooker):
+    ...
@@ -1,16 +1,31 @@
 
 import pygame
+import numpy as np
 from pygame.math import Vector2
-from typing import List, Tuple
+from typing import List, Tuple, Dict
+from enum import Enum
+from collections import OrderedDict
+from contextlib import contextmanager
 from StateMachine import BallType
-from math import atan2, degrees
-from Calc import gaussian_blur
+from Events import events, Event
+from math import atan2, degrees, sqrt, floor
+from Calc import gaussian_blur, grid_candidate_pairs, all_pairs
 
 ball_numbers_font = None
 win: pygame.Surface = None
 draw_solids = False
+broad_phase = True # False checks every pair of balls, for comparing against the grid
 
 BALL_RADIUS = 13
+FRICTION = 0.9975
+REST_THRESHOLD = 0.01
+SUBSTEPS = 5
+
+# shadows are drawn from an atlas of pre-rendered sprites
+SHADOW_SIZE = 128
+SHADOW_SKEW_STEP = 0.02
+SHADOW_ANGLE_STEP = 2.0 # degrees
+SHADOW_ATLAS_SIZE = 512
 texture_mult = 64
 loaded_textures = True
 try:
@@ -51,10 +66,137 @@ ball_color = {
     107: (14, 14, 14),
 }
 
+class Solver(Enum):
+    FIXED_STEP = 0
+    EVENT_DRIVEN = 1
+
+class BallArrays:
+    ''' struct of arrays holding the state of the balls on the table. row i belongs to Ball._reg[i] '''
+    def __init__(self):
+        self.pos = np.zeros((0, 2))
+        self.vel = np.zeros((0, 2))
+        self.acc = np.zeros((0, 2))
+        self.stable = np.zeros(0, dtype=bool)
+
+    def append(self, pos, vel, acc, stable) -> int:
+        self.pos = np.vstack((self.pos, (pos[0], pos[1])))
+        self.vel = np.vstack((self.vel, (vel[0], vel[1])))
+        self.acc = np.vstack((self.acc, (acc[0], acc[1])))
+        self.stable = np.append(self.stable, stable)
+        return len(self.stable) - 1
+
+    def clear(self):
+        self.__init__()
+
+    def remove(self, index: int):
+        self.pos = np.delete(self.pos, index, axis=0)
+        self.vel = np.delete(self.vel, index, axis=0)
+        self.acc = np.delete(self.acc, index, axis=0)
+        self.stable = np.delete(self.stable, index)
+
+    def step(self):
+        # integrate all balls at once, same order of operations as a single ball step
+        self.vel += self.acc
+        self.vel *= FRICTION
+        self.pos += self.vel
+
+        self.vel[np.abs(self.vel) < REST_THRESHOLD] = 0.0
+        self.stable = ~self.vel.any(axis=1)
+
+        self.acc[:] = 0.0
+
+    def is_stable(self) -> bool:
+        return bool(self.stable.all())
+
+class ShadowAtlas:
+    ''' shadow sprites keyed by quantized (skew, angle), rendered on first use. the least recently used are dropped '''
+    def __init__(self, capacity: int=SHADOW_ATLAS_SIZE):
+        self.capacity = capacity
+        self.sprites: OrderedDict = OrderedDict()
+
+    def get(self, skew: float, angle: float) -> pygame.Surface:
+        key = (round(skew / SHADOW_SKEW_STEP), round(angle / SHADOW_ANGLE_STEP) % round(360 / SHADOW_ANGLE_STEP))
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.render(key[0] * SHADOW_SKEW_STEP, key[1] * SHADOW_ANGLE_STEP)
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.capacity:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+
+    @staticmethod
+    def render(skew: float, angle: float) -> pygame.Surface:
+        shadow_surf = pygame.Surface((SHADOW_SIZE, SHADOW_SIZE), pygame.SRCALPHA)
+        d = SHADOW_SIZE / 3
+        w = skew * d
+        h = d
+        x = SHADOW_SIZE / 2 - w / 2
+        y = SHADOW_SIZE / 2 - h / 2
+        pygame.draw.ellipse(shadow_surf, (0,0,0), (x, y, w, h))
+        shadow_surf = pygame.transform.rotate(shadow_surf, angle)
+
+        factor = (Ball._radius * 6.0 ) / SHADOW_SIZE
+        shadow_surf = pygame.transform.smoothscale_by(shadow_surf, factor)
+        shadow_surf = gaussian_blur(shadow_surf, 3)
+        shadow_surf.fill((0,0,0,230), special_flags=pygame.BLEND_RGBA_SUB)
+        if pygame.display.get_surface() is not None:
+            shadow_surf = shadow_surf.convert_alpha()
+        return shadow_surf
+
+shadow_atlas = ShadowAtlas()
+
+# ball sprites are shared by every ball of the same number and size, respotted balls included
+ball_sprites: Dict[Tuple[int, float], pygame.Surface] = {}
+
+def get_ball_sprite(number: int, radius: float) -> pygame.Surface:
+    key = (number, radius)
+    sprite = ball_sprites.get(key)
+    if sprite is None:
+        sprite = render_ball_sprite(number, radius)
+        ball_sprites[key] = sprite
+    return sprite
+
+def render_ball_sprite(number: int, radius: float) -> pygame.Surface:
+    color = ball_color[number]
+    size_multiplied = texture_mult
+    surf = pygame.Surface((size_multiplied, size_multiplied), pygame.SRCALPHA)
+    if number > 8 and number < 100:
+        # stripe
+        surf.fill(ball_color[0])
+        surf.fill(color, ((0, size_multiplied * 0.25), (surf.get_width(), surf.get_height() - size_multiplied / 2)))
+    else:
+        # solid
+        surf.fill(color)
+
+    draw_number = True
+    if number > 100:
+        draw_number = False
+
+    if draw_number:
+        pygame.draw.circle(surf, ball_color[0], (size_multiplied / 2, size_multiplied / 2), size_multiplied * 0.25)
+
+        if number != 0:
+            text = ball_numbers_font.render(str(number), True, (0,0,0))
+            surf.blit(text, (surf.get_width() / 2 - text.get_width() / 2, surf.get_height() / 2 - text.get_height() / 2))
+
+    # apply mask
+    mask = pygame.Surface((size_multiplied, size_multiplied), pygame.SRCALPHA)
+    mask.fill((255,255,255,255))
+    pygame.draw.circle(mask, (0,0,0,0), (size_multiplied / 2, size_multiplied / 2), size_multiplied / 2)
+    surf.blit(mask, (0,0), special_flags=pygame.BLEND_RGBA_SUB)
+
+    # scale
+    surf = pygame.transform.smoothscale_by(surf, (2 * radius) / size_multiplied)
+    if pygame.display.get_surface() is not None:
+        surf = surf.convert_alpha()
+    return surf
+
 class Ball:
     _radius = BALL_RADIUS
+    _arrays = BallArrays()
     _reg: List['Ball'] = []
-    _fakes: List['Ball'] = []
     _collisions: Tuple['Ball', 'Ball'] = []
     _ball_to_remove: List['Ball'] = []
     _entered_balls: List['Ball'] = []
@@ -62,25 +204,22 @@ class Ball:
     _potted_this_turn: List[BallType] = []
     _cue_ball: 'CueBall' = None
     _lamps: List[Vector2] = []
-    def __init__(self, pos=Vector2(0,0), fake=False, number=0):
-        
-        self.pos = pos
-        self.vel = Vector2(0,0)
-        self.acc = Vector2(0,0)
-        self.stable = False
-        self.is_fake = fake
-        if fake:
-            Ball._fakes.append(self)
-        else:
-            Ball._reg.append(self)
+    def __init__(self, pos=Vector2(0,0), number=0):
+        # balls on the table live in Ball._arrays, index is their row. potted balls keep their own vectors
+        self.index: int = None
+        self._pos = Vector2(pos)
+        self._vel = Vector2(0,0)
+        self._acc = Vector2(0,0)
+        self._stable = False
+        Ball._reg.append(self)
+        self.index = Ball._arrays.append(self._pos, self._vel, self._acc, self._stable)
         self.number = number
-        self.create_surf()
-        if not self.is_fake: print(f'--- placing ball {self.get_type()} in position {self.pos}')
+        self._surf: pygame.Surface = None
+        if events.enabled:
+            events.emit(Event.BALL_PLACED, ball=self.number, type=self.get_type(), pos=tuple(self._pos))
     
     def __str__(self):
-        if self.is_fake:
-            return f'Fake_Ball'
-        elif self.number == 0:
+        if self.number == 0:
             return 'Cue_Ball'
         return f'Ball_{self.number}'
 
@@ -113,176 +252,246 @@ class Ball:
                 case 107:
                     return BallType.SNOOKER_BLACK
 
+    # pos, vel and acc are views into Ball._arrays. reading returns a copy, so write back by assignment
+    @property
+    def pos(self) -> Vector2:
+        if self.index is None:
+            return self._pos
+        return Vector2(Ball._arrays.pos[self.index].tolist())
+
+    @pos.setter
+    def pos(self, pos):
+        if self.index is None:
+            self._pos = Vector2(pos)
+        else:
+            Ball._arrays.pos[self.index] = (pos[0], pos[1])
+
+    @property
+    def vel(self) -> Vector2:
+        if self.index is None:
+            return self._vel
+        return Vector2(Ball._arrays.vel[self.index].tolist())
+
+    @vel.setter
+    def vel(self, vel):
+        if self.index is None:
+            self._vel = Vector2(vel)
+        else:
+            Ball._arrays.vel[self.index] = (vel[0], vel[1])
+
+    @property
+    def acc(self) -> Vector2:
+        if self.index is None:
+            return self._acc
+        return Vector2(Ball._arrays.acc[self.index].tolist())
+
+    @acc.setter
+    def acc(self, acc):
+        if self.index is None:
+            self._acc = Vector2(acc)
+        else:
+            Ball._arrays.acc[self.index] = (acc[0], acc[1])
+
+    @property
+    def stable(self) -> bool:
+        if self.index is None:
+            return self._stable
+        return bool(Ball._arrays.stable[self.index])
+
+    @stable.setter
+    def stable(self, stable: bool):
+        if self.index is None:
+            self._stable = stable
+        else:
+            Ball._arrays.stable[self.index] = stable
+
     def set_vel(self, vel):
         self.vel = vel
-        if self.vel != Vector2(0,0):
+        if vel != Vector2(0,0):
             self.stable = False
     
     def set_acc(self, acc):
         self.acc = acc
 
-    def step(self):
-        self.vel += self.acc
-        self.vel *= 0.9975
-        self.pos += self.vel
+    def remove_from_table(self):
+        ''' take the ball off the arrays, keeping its last state on the instance '''
+        index = self.index
+        self._pos, self._vel, self._acc, self._stable = self.pos, self.vel, self.acc, self.stable
+        self.index = None
+        Ball._arrays.remove(index)
+        Ball._reg.remove(self)
+        for ball in Ball._reg[index:]:
+            ball.index -= 1
 
-        if abs(self.vel[0]) < 0.01:
-            self.vel[0] = 0
-        if abs(self.vel[1]) < 0.01:
-            self.vel[1] = 0
-        
-        if self.vel == Vector2(0,0):
-            self.stable = True
-        
-        self.acc *= 0
-    
     def potted(self):
         Ball._entered_balls.append(self)
         Ball._potted_this_turn.append(self.get_type())
-        Ball._reg.remove(self)
+        if events.enabled:
+            events.emit(Event.POT, ball=self.number, type=self.get_type())
+        self.remove_from_table()
 
     @staticmethod
     def resolve_line_collision():
-        for ball in Ball._reg:
-            for line in Line._reg:
-                l1 = line.end - line.start
-                l2 = ball.pos - line.start
-
-                edge_length = l1.length_squared()
-                t = max(0, min(edge_length, (l1[0] * l2[0] + l1[1] * l2[1]))) / edge_length
-                closest = line.start + t * l1
-                distance = ball.pos.distance_to(closest)
-                if distance <= Ball._radius + Line._radius:
-                    b = Ball(closest, fake=True)
-                    b.vel = -ball.vel
-
-                    overlap = 1.0 * (distance - (Ball._radius + Line._radius))
-                    ball.pos -= overlap * (ball.pos - b.pos) / distance
-                    Ball._collisions.append((ball, b))
+        # lines are treated as static capsules, a contact pushes the ball out and mirrors its velocity on the contact normal
+        if Line._index is None:
+            Line.build_index()
+        index = Line._index
+        contact = Ball._radius + Line._radius
+        positions = Ball._arrays.pos.tolist()
+        velocities = Ball._arrays.vel.tolist()
+        for pos, vel in zip(positions, velocities):
+            for k in index.nearby(pos):
+                start_x, start_y = index.starts[k]
+                edge_x, edge_y = index.edges[k]
+                rel_x = pos[0] - start_x
+                rel_y = pos[1] - start_y
+                t = rel_x * edge_x + rel_y * edge_y
+                if 0 < t < index.lengths_squared[k]:
+                    # closest point inside the segment, distance along the precomputed normal
+                    normal_x, normal_y = index.normals[k]
+                    distance = rel_x * normal_x + rel_y * normal_y
+                    if distance < 0:
+                        distance = -distance
+                        normal_x, normal_y = -normal_x, -normal_y
+                else:
+                    # closest point is one of the ends
+                    if t > 0:
+                        rel_x -= edge_x
+                        rel_y -= edge_y
+                    distance = sqrt(rel_x * rel_x + rel_y * rel_y)
+                    if distance == 0:
+                        continue
+                    normal_x = rel_x / distance
+                    normal_y = rel_y / distance
+                if distance > contact:
+                    continue
+
+                overlap = distance - contact
+                pos[0] -= overlap * normal_x
+                pos[1] -= overlap * normal_y
+
+                dot_normal = vel[0] * normal_x + vel[1] * normal_y
+                if dot_normal < 0:
+                    vel[0] -= 2 * dot_normal * normal_x
+                    vel[1] -= 2 * dot_normal * normal_y
+        if positions:
+            Ball._arrays.pos[:] = positions
+            Ball._arrays.vel[:] = velocities
+
+    @staticmethod
+    def record_touch(ball: 'Ball', target: 'Ball'):
+        # check for first cue touch
+        if all([Ball._first_cue_touch is None,
+                (ball.get_type() == BallType.BALL_CUE or target.get_type() == BallType.BALL_CUE)]):
+            Ball._first_cue_touch = target.get_type() if target.get_type() != BallType.BALL_CUE else ball.get_type()
 
     @staticmethod
     def resolve_ball_collisions():
-        for ball in Ball._reg:
-            for target in Ball._reg:
-                if ball is target:
-                    continue
-                distance = ball.pos.distance_to(target.pos)
-                if distance == 0:
-                    distance = 0.01
-                second_radius = Ball._radius
-                if ball.is_fake or target.is_fake:
-                    second_radius = Line._radius
-                if distance < Ball._radius * 2:
-                    if True:
-                        # resolve static collision by overlap
-                        overlap = 0.5 * (distance - Ball._radius - second_radius)
-                        ball.pos -= overlap * (ball.pos - target.pos) / distance
-                        target.pos += overlap * (ball.pos - target.pos) / distance
-                    
-                    Ball._collisions.append((ball, target))
+        # work on plain floats taken from the arrays, the pair loop is too hot for vector temporaries
+        positions = Ball._arrays.pos.tolist()
+        diameter = Ball._radius * 2
+        if broad_phase:
+            pairs = grid_candidate_pairs(positions, diameter)
+        else:
+            pairs = all_pairs(len(positions))
+
+        for i, j in pairs:
+            ball_pos = positions[i]
+            target_pos = positions[j]
+            dx = ball_pos[0] - target_pos[0]
+            dy = ball_pos[1] - target_pos[1]
+            distance = sqrt(dx * dx + dy * dy)
+            if distance == 0:
+                distance = 0.01
+            if distance < diameter:
+                # resolve static collision by overlap
+                overlap = 0.5 * (distance - diameter)
+                ball_pos[0] -= overlap * dx / distance
+                ball_pos[1] -= overlap * dy / distance
+                target_pos[0] += overlap * (ball_pos[0] - target_pos[0]) / distance
+                target_pos[1] += overlap * (ball_pos[1] - target_pos[1]) / distance
+
+                Ball._collisions.append((Ball._reg[i], Ball._reg[j]))
+        if positions:
+            Ball._arrays.pos[:] = positions
         
         for ball, target in Ball._collisions:
-            # check for first cue touch
-            if all([Ball._first_cue_touch is None,
-                    not ball.is_fake and not target.is_fake,
-                    (ball.get_type() == BallType.BALL_CUE or target.get_type() == BallType.BALL_CUE)]):
-                Ball._first_cue_touch = target.get_type() if target.get_type() != BallType.BALL_CUE else ball.get_type()
+            Ball.record_touch(ball, target)
 
-            distance = ball.pos.distance_to(target.pos)
+            ball_pos = ball.pos
+            target_pos = target.pos
+            distance = ball_pos.distance_to(target_pos)
             if distance == 0:
                 distance = 0.01
 
-            normal = (target.pos - ball.pos) / distance
+            normal = (target_pos - ball_pos) / distance
             tangent = Vector2(-normal[1], normal[0])
 
-            dot_tangent1 = ball.vel[0] * tangent[0] + ball.vel[1] * tangent[1]
-            dot_tangent2 = target.vel[0] * tangent[0] + target.vel[1] * tangent[1]
+            ball_vel = ball.vel
+            target_vel = target.vel
+            dot_tangent1 = ball_vel[0] * tangent[0] + ball_vel[1] * tangent[1]
+            dot_tangent2 = target_vel[0] * tangent[0] + target_vel[1] * tangent[1]
 
-            dot_normal1 = ball.vel[0] * normal[0] + ball.vel[1] * normal[1]
-            dot_normal2 = target.vel[0] * normal[0] + target.vel[1] * normal[1]
+            dot_normal1 = ball_vel[0] * normal[0] + ball_vel[1] * normal[1]
+            dot_normal2 = target_vel[0] * normal[0] + target_vel[1] * normal[1]
             
             ball.set_vel(tangent * dot_tangent1 + normal * dot_normal2)
             target.set_vel(tangent * dot_tangent2 + normal * dot_normal1)
         
-        Ball._fakes = []
         Ball._collisions = []
 
-    def draw_shadows(self):
-        shadow_size = 128
-        
+    def get_shadow_blits(self) -> List[Tuple[pygame.Surface, Vector2]]:
+        pos = self.pos
+        blits = []
         for lamp in Ball._lamps:
-            shadow_surf = pygame.Surface((shadow_size, shadow_size), pygame.SRCALPHA)
             # calc distance to lamp
-            dist = self.pos.distance_to(lamp)
+            dist = pos.distance_to(lamp)
             skew = 0.002 * dist + 1.0
-            d = shadow_size / 3
-            w = skew * d
-            h = d
-            x = shadow_size / 2 - w / 2
-            y = shadow_size / 2 - h / 2
-            pygame.draw.ellipse(shadow_surf, (0,0,0), (x, y, w, h))
+            w = skew * SHADOW_SIZE / 3
 
             # rotate
-            direction = (self.pos - lamp)
+            direction = (pos - lamp)
             if direction == Vector2(0,0):
                 angle = 0
             else:
                 direction = direction.normalize()
                 angle = degrees(atan2(*direction)) + 90
-            offset = direction * (w / 2)
-            shadow_surf = pygame.transform.rotate(shadow_surf, angle)
             
-            factor = (Ball._radius * 6.0 ) / shadow_size
-            offset = offset * factor
-
-            shadow_surf = pygame.transform.smoothscale_by(shadow_surf, factor)
-            shadow_surf = gaussian_blur(shadow_surf, 3)
-            shadow_surf.fill((0,0,0,230), special_flags=pygame.BLEND_RGBA_SUB)
-            win.blit(shadow_surf, self.pos - Vector2(shadow_surf.get_size()) / 2 + offset)
-
-    def create_surf(self):
-        color = ball_color[self.number]
-        size_multiplied = texture_mult
-        self.surf = pygame.Surface((size_multiplied, size_multiplied), pygame.SRCALPHA)
-        if self.number > 8 and self.number < 100:
-            # stripe
-            self.surf.fill(ball_color[0])
-            self.surf.fill(color, ((0, size_multiplied * 0.25), (self.surf.get_width(), self.surf.get_height() - size_multiplied / 2)))
-        else:
-            # solid
-            self.surf.fill(color)
-        
-        draw_number = True
-        if self.number > 100:
-            draw_number = False
-        
-        if draw_number:
-            pygame.draw.circle(self.surf, ball_color[0], (size_multiplied / 2, size_multiplied / 2), size_multiplied * 0.25)
+            factor = (Ball._radius * 6.0 ) / SHADOW_SIZE
+            offset = direction * (w / 2) * factor
+
+            shadow_surf = shadow_atlas.get(skew, angle)
+            blits.append((shadow_surf, pos - Vector2(shadow_surf.get_size()) / 2 + offset))
+        return blits
 
-            if self.number != 0:
-                text = ball_numbers_font.render(str(self.number), True, (0,0,0))
-                self.surf.blit(text, (self.surf.get_width() / 2 - text.get_width() / 2, self.surf.get_height() / 2 - text.get_height() / 2))
+    def get_blits(self) -> List[Tuple[pygame.Surface, Vector2]]:
+        pos = self.pos
+        blits = [(self.surf, pos - Vector2(Ball._radius, Ball._radius))]
+        if loaded_textures:
+            blits.append((reflection_map, pos - Vector2(reflection_map.get_width() / 2, reflection_map.get_height() / 2)))
+        return blits
 
-        # apply mask
-        mask = pygame.Surface((size_multiplied, size_multiplied), pygame.SRCALPHA)
-        mask.fill((255,255,255,255))
-        pygame.draw.circle(mask, (0,0,0,0), (size_multiplied / 2, size_multiplied / 2), size_multiplied / 2)
-        self.surf.blit(mask, (0,0), special_flags=pygame.BLEND_RGBA_SUB)
+    def get_rects(self) -> List[Tuple[pygame.Surface, pygame.Rect]]:
+        ''' the sprites of the shadows and the ball, with the parts of the window they cover '''
+        return [(surf, pygame.Rect(dest, surf.get_size())) for surf, dest in self.get_shadow_blits() + self.get_blits()]
 
-        # scale
-        self.surf = pygame.transform.smoothscale_by(self.surf, (2 * Ball._radius) / size_multiplied)
+    def draw_shadows(self) -> List[pygame.Rect]:
+        return [win.blit(surf, dest) for surf, dest in self.get_shadow_blits()]
 
-    def draw(self):
-        win.blit(self.surf, self.pos - Vector2(Ball._radius, Ball._radius))
-        if loaded_textures:
-            pos = self.pos - Vector2(reflection_map.get_width() / 2, reflection_map.get_height() / 2)
-            win.blit(reflection_map, pos)
+    @property
+    def surf(self) -> pygame.Surface:
+        # rendered on first use, so headless simulation never needs a font or surfaces
+        if self._surf is None:
+            self._surf = get_ball_sprite(self.number, Ball._radius)
+        return self._surf
+
+    def draw(self) -> List[pygame.Rect]:
+        return [win.blit(surf, dest) for surf, dest in self.get_blits()]
 
     @staticmethod
     def step_balls():
-        for i in range(5):
-            for ball in Ball._reg:
-                ball.step()
+        for i in range(SUBSTEPS):
+            Ball._arrays.step()
 
             Ball.resolve_line_collision()
             Ball.resolve_ball_collisions()
@@ -293,21 +502,20 @@ class Ball:
 
     @staticmethod
     def check_stability():
-        for ball in Ball._reg:
-            if not ball.stable:
-                return False
-        return True
+        return Ball._arrays.is_stable()
 
     @staticmethod
-    def draw_balls():
+    def draw_balls() -> List[pygame.Rect]:
         # if loaded_textures:
         #     for ball in Ball._reg:
         #         pos = ball.pos - Vector2(shadow_map.get_width() / 2, shadow_map.get_height() / 2)
         #         win.blit(shadow_map, pos)
+        rects = []
         for ball in Ball._reg:
-            ball.draw_shadows()
+            rects += ball.draw_shadows()
         for ball in Ball._reg:
-            ball.draw()
+            rects += ball.draw()
+        return rects
         
 
 class CueBall(Ball):
@@ -330,34 +538,190 @@ class CueBall(Ball):
         self.pos = Vector2(pos)
     
     def strike(self, direction: Vector2, power: float):
+        if events.enabled:
+            events.emit(Event.SHOT, pos=tuple(self.pos), direction=tuple(direction), power=power)
         self.set_vel(direction.normalize() * power * 7.5)
 
     def potted(self):
         self.is_out = True
         Ball._potted_this_turn.append(self.get_type())
-        Ball._reg.remove(self)
+        if events.enabled:
+            events.emit(Event.POT, ball=self.number, type=self.get_type())
+        self.remove_from_table()
+
+class TableState:
+    '''
+    numbers and positions of the balls on the table, enough to set up a shot. a snapshot also keeps the motion
+    of the balls and the bookkeeping of the turn, so restoring it puts the table back exactly
+    '''
+    def __init__(self, numbers: List[int], positions, velocities=None, accelerations=None, stable=None,
+                 entered: List[int]=(), first_cue_touch: BallType=None, potted_this_turn: List[BallType]=()):
+        self.numbers = list(numbers)
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.velocities = np.zeros_like(self.positions) if velocities is None else np.array(velocities, dtype=float).reshape(-1, 2)
+        self.accelerations = np.zeros_like(self.positions) if accelerations is None else np.array(accelerations, dtype=float).reshape(-1, 2)
+        self.stable = np.ones(len(self.numbers), dtype=bool) if stable is None else np.array(stable, dtype=bool)
+        self.entered = list(entered)
+        self.first_cue_touch = first_cue_touch
+        self.potted_this_turn = list(potted_this_turn)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    @staticmethod
+    def capture() -> 'TableState':
+        return TableState([ball.number for ball in Ball._reg], Ball._arrays.pos)
+
+    @staticmethod
+    def snapshot() -> 'TableState':
+        ''' the whole table in motion, for undo, replays and search '''
+        arrays = Ball._arrays
+        return TableState([ball.number for ball in Ball._reg], arrays.pos, arrays.vel, arrays.acc, arrays.stable,
+                          [ball.number for ball in Ball._entered_balls], Ball._first_cue_touch, Ball._potted_this_turn)
+
+    def place(self):
+        ''' create the balls of this state on the table '''
+        for number, pos in zip(self.numbers, self.positions.tolist()):
+            if number == 0:
+                CueBall(Vector2(pos))
+            else:
+                Ball(Vector2(pos), number=number)
+
+    def restore(self):
+        '''
+        put the table back to this snapshot in the active world. when the same balls are on the table only the
+        arrays are copied, otherwise the balls are placed again
+        '''
+        if ([ball.number for ball in Ball._reg] != self.numbers or
+            [ball.number for ball in Ball._entered_balls] != self.entered):
+            # into the active world, whichever it is, its registries are emptied in place
+            Ball._arrays.clear()
+            Ball._reg.clear()
+            Ball._entered_balls.clear()
+            Ball._cue_ball = None
+            # putting balls back is not play, no events for it
+            with events.muted():
+                self.place()
+                for number in self.entered:
+                    ball = Ball(number=number)
+                    ball.remove_from_table()
+                    Ball._entered_balls.append(ball)
+                if Ball._cue_ball is None:
+                    # cue ball in hand
+                    cue_ball = CueBall()
+                    cue_ball.remove_from_table()
+                    cue_ball.is_out = True
+
+        arrays = Ball._arrays
+        arrays.pos = self.positions.copy()
+        arrays.vel = self.velocities.copy()
+        arrays.acc = self.accelerations.copy()
+        arrays.stable = self.stable.copy()
+        Ball._collisions = []
+        Ball._ball_to_remove = []
+        Ball._first_cue_touch = self.first_cue_touch
+        Ball._potted_this_turn = list(self.potted_this_turn)
+
+class World:
+    '''
+    one set of the registries the physics reads. the classes read the active world from their class attributes,
+    activate swaps a world in. lines and holes are static and shared with the live table unless given
+    '''
+    def __init__(self, lines: List['Line']=None, holes: List['Hole']=None):
+        self.arrays = BallArrays()
+        self.balls: List[Ball] = []
+        self.collisions = []
+        self.ball_to_remove: List[Ball] = []
+        self.entered_balls: List[Ball] = []
+        self.first_cue_touch: BallType = None
+        self.potted_this_turn: List[BallType] = []
+        self.cue_ball: CueBall = None
+        self.lines = Line._reg if lines is None else lines
+        self.line_index = Line._index if lines is None else None
+        self.holes = Hole._reg if holes is None else holes
+
+    def store(self):
+        ''' take the registries from the class attributes, they are rebound as the table changes '''
+        self.arrays, self.balls, self.collisions, self.ball_to_remove = Ball._arrays, Ball._reg, Ball._collisions, Ball._ball_to_remove
+        self.entered_balls, self.first_cue_touch, self.potted_this_turn = Ball._entered_balls, Ball._first_cue_touch, Ball._potted_this_turn
+        self.cue_ball = Ball._cue_ball
+        self.lines, self.line_index, self.holes = Line._reg, Line._index, Hole._reg
+
+    def activate(self):
+        Ball._arrays, Ball._reg, Ball._collisions, Ball._ball_to_remove = self.arrays, self.balls, self.collisions, self.ball_to_remove
+        Ball._entered_balls, Ball._first_cue_touch, Ball._potted_this_turn = self.entered_balls, self.first_cue_touch, self.potted_this_turn
+        Ball._cue_ball = self.cue_ball
+        Line._reg, Line._index, Hole._reg = self.lines, self.line_index, self.holes
+
+    @staticmethod
+    def current() -> 'World':
+        world = World()
+        world.store()
+        return world
+
+    @contextmanager
+    def active(self):
+        ''' run with this world, the registries are class level so this is not thread safe '''
+        previous = World.current()
+        self.activate()
+        try:
+            yield self
+        finally:
+            self.store()
+            previous.activate()
+
+class CushionIndex:
+    ''' static view of the table lines for collision tests, built once per table '''
+    def __init__(self, lines: List['Line'], reach: float, cell_size: float=64):
+        self.starts = [(line.start[0], line.start[1]) for line in lines]
+        self.edges = [(line.end[0] - line.start[0], line.end[1] - line.start[1]) for line in lines]
+        self.lengths_squared = [x * x + y * y for x, y in self.edges]
+        self.inv_lengths = [1.0 / sqrt(length_squared) for length_squared in self.lengths_squared]
+        self.normals = [(-y * inv_length, x * inv_length) for (x, y), inv_length in zip(self.edges, self.inv_lengths)]
+
+        # map every cell to the lines that can be within reach of a point inside it
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for k, line in enumerate(lines):
+            left = min(line.start[0], line.end[0]) - reach
+            right = max(line.start[0], line.end[0]) + reach
+            top = min(line.start[1], line.end[1]) - reach
+            bottom = max(line.start[1], line.end[1]) + reach
+            for cx in range(floor(left / cell_size), floor(right / cell_size) + 1):
+                for cy in range(floor(top / cell_size), floor(bottom / cell_size) + 1):
+                    self.cells.setdefault((cx, cy), []).append(k)
+
+    def nearby(self, point) -> List[int]:
+        return self.cells.get((floor(point[0] / self.cell_size), floor(point[1] / self.cell_size)), [])
 
 class Line:
     _reg: List['Line'] = []
     _radius = 5
+    _index: CushionIndex = None
     def __init__(self, start: Vector2, end: Vector2):
         Line._reg.append(self)
         self.start = start
         self.end = end
 
-    def draw(self):
+    def draw(self, surf: pygame.Surface=None):
+        surf = surf or win
         color = (255,255,255)
-        pygame.draw.line(win, color, self.start, self.end, Line._radius * 2)
-        pygame.draw.circle(win, color, self.start, Line._radius)
-        pygame.draw.circle(win, color, self.end, Line._radius)
-        pygame.draw.line(win, (255,0,0), self.start, self.end)
+        pygame.draw.line(surf, color, self.start, self.end, Line._radius * 2)
+        pygame.draw.circle(surf, color, self.start, Line._radius)
+        pygame.draw.circle(surf, color, self.end, Line._radius)
+        pygame.draw.line(surf, (255,0,0), self.start, self.end)
+
+    @staticmethod
+    def build_index():
+        ''' call once the table lines are placed '''
+        Line._index = CushionIndex(Line._reg, Ball._radius + Line._radius)
 
     @staticmethod
-    def draw_lines():
+    def draw_lines(surf: pygame.Surface=None):
         if not draw_solids:
             return
         for line in Line._reg:
-            line.draw()
+            line.draw(surf)
 
 class Hole:
     _reg: List['Hole'] = []
@@ -377,15 +741,16 @@ class Hole:
             force = (self.pos - ball.pos).normalize()
             ball.set_acc((self.radius / distance **2) * force)
 
-            if distance < self.radius * 0.8:
+            if distance < self.radius * 0.8 and ball not in Ball._ball_to_remove:
                 Ball._ball_to_remove.append(ball)
     
-    def draw(self):
+    def draw(self, surf: pygame.Surface=None):
         if not draw_solids:
             return
-        pygame.draw.circle(win, (0,0,0), self.pos, self.radius)
-        pygame.draw.circle(win, (255,0,0), self.pos, self.radius, 1)
+        surf = surf or win
+        pygame.draw.circle(surf, (0,0,0), self.pos, self.radius)
+        pygame.draw.circle(surf, (255,0,0), self.pos, self.radius, 1)
         draw_target = False
         if draw_target:
-            pygame.draw.circle(win, (0,255,0), self.target_pos, 5)
+            pygame.draw.circle(surf, (0,255,0), self.target_pos, 5)
 
@@ -0,0 +1,184 @@
+'''
+physics micro benchmark. runs a fixed set of seeded shots on the racks of every rule set headlessly and reports
+substeps per second (events for the event driven solver), time to rest and the time spent in the collision
+and pocket passes. results are written as json so runs before and after an engine change can be compared
+
+    python PhysicsBenchmark.py --out before.json
+    python PhysicsBenchmark.py --out after.json --compare before.json
+'''
+
+import sys
+import json
+import random
+import argparse
+import platform
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import List, Dict, Callable
+import numpy as np
+from pygame.math import Vector2
+import Physics
+from Physics import Ball, Hole, World, Solver, SUBSTEPS
+from StateMachine import Rules
+import Simulation
+import Table
+
+RULES = [Rules.EIGHT_BALL, Rules.NINE_BALL, Rules.SNOOKER]
+REPEAT = 3
+
+class BenchShot:
+    ''' a named shot, setup places any extra balls on the racked table and returns the direction and power '''
+    def __init__(self, name: str, setup: Callable[[], tuple]):
+        self.name = name
+        self.setup = setup
+
+def setup_break():
+    return Vector2(1, 0.01), 1.0
+
+def setup_stun():
+    # straight onto a ball in open table, the cue ball stops dead on contact
+    # an object ball number not on the table in any of the rule sets
+    cue_ball = Ball._cue_ball
+    number = max(ball.number for ball in Ball._reg if ball.number < 100) + 1
+    target = Ball(cue_ball.pos + Vector2(0, -150), number=number)
+    return target.pos - cue_ball.pos, 0.6
+
+def setup_safety():
+    # away from the rack, around the table off several cushions
+    return Vector2(-1, 0.45), 0.9
+
+SHOTS = [
+    BenchShot('break', setup_break),
+    BenchShot('stun', setup_stun),
+    BenchShot('multi_rail_safety', setup_safety),
+]
+
+@contextmanager
+def timed_sections(totals: Dict[str, float]):
+    ''' time the collision and pocket passes of the fixed step solver, the originals are put back after '''
+    def timed(name: str, function):
+        def wrapper(*args):
+            start = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                totals[name] += perf_counter() - start
+        return wrapper
+
+    saved = (Ball.resolve_ball_collisions, Ball.resolve_line_collision, Hole.step)
+    Ball.resolve_ball_collisions = staticmethod(timed('resolve_ball_collisions', saved[0]))
+    Ball.resolve_line_collision = staticmethod(timed('resolve_line_collision', saved[1]))
+    Hole.step = timed('Hole.step', saved[2])
+    try:
+        yield
+    finally:
+        Ball.resolve_ball_collisions, Ball.resolve_line_collision, Hole.step = (staticmethod(saved[0]), staticmethod(saved[1]), saved[2])
+
+def run_shot(rules: Rules, shot: BenchShot, seed: int, solver: Solver, sections: bool=False) -> Dict:
+    '''
+    one run of a shot in a world of its own. with sections the passes are timed too, which slows the whole
+    run down, so its time to rest is not comparable with a plain run
+    '''
+    with World([], []).active():
+        Table.build_table()
+        random.seed(seed)
+        Table.build_balls(rules)
+        direction, power = shot.setup()
+
+        totals = {'resolve_ball_collisions': 0.0, 'resolve_line_collision': 0.0, 'Hole.step': 0.0}
+        with timed_sections(totals) if sections else nullcontext():
+            Ball._cue_ball.strike(Vector2(direction), power)
+            start = perf_counter()
+            steps = Simulation.run_to_rest(solver)
+            elapsed = perf_counter() - start
+
+        # frames for the fixed step solver, which take SUBSTEPS each, events for the event driven one
+        substeps = steps * SUBSTEPS if solver == Solver.FIXED_STEP else steps
+        return {
+            'steps': steps,
+            'substeps': substeps,
+            'time_to_rest': elapsed,
+            'substeps_per_second': substeps / elapsed if elapsed > 0 else 0.0,
+            'sections': totals,
+            'potted': len(Ball._potted_this_turn),
+            'positions_hash': hash(Ball._arrays.pos.tobytes()),
+        }
+
+def run_benchmark(solver: Solver=Solver.FIXED_STEP, repeat: int=REPEAT) -> Dict:
+    results = []
+    for rules in RULES:
+        for seed, shot in enumerate(SHOTS):
+            runs = [run_shot(rules, shot, seed, solver) for i in range(repeat)]
+            # the fastest run is the least disturbed by the rest of the machine
+            best = min(runs, key=lambda run: run['time_to_rest'])
+            # the breakdown comes from a run of its own, the timing wrappers would slow the measured ones
+            sectioned = run_shot(rules, shot, seed, solver, sections=True)
+            results.append({
+                'rules': rules.name,
+                'shot': shot.name,
+                'seed': seed,
+                'steps': best['steps'],
+                'substeps': best['substeps'],
+                'time_to_rest': best['time_to_rest'],
+                'median_time_to_rest': float(np.median([run['time_to_rest'] for run in runs])),
+                'substeps_per_second': best['substeps_per_second'],
+                'sections': sectioned['sections'],
+                'potted': best['potted'],
+                # runs of the same build must agree, a difference means the simulation is not deterministic
+                'deterministic': len({run['positions_hash'] for run in runs + [sectioned]}) == 1,
+            })
+    return {
+        'meta': {
+            'solver': solver.name,
+            'repeat': repeat,
+            'broad_phase': Physics.broad_phase,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def print_results(report: Dict, baseline: Dict=None):
+    previous = {}
+    if baseline is not None:
+        previous = {(result['rules'], result['shot']): result for result in baseline['results']}
+
+    print(f"solver {report['meta']['solver']}, best of {report['meta']['repeat']}, pass times from a run of their own")
+    print(f"{'rules':<11} {'shot':<18} {'steps':>6} {'rest ms':>9} {'substeps/s':>11} {'balls ms':>9} {'lines ms':>9} {'holes ms':>9}")
+    for result in report['results']:
+        sections = result['sections']
+        line = (f"{result['rules']:<11} {result['shot']:<18} {result['steps']:>6} {result['time_to_rest'] * 1000:>9.1f} "
+                f"{result['substeps_per_second']:>11.0f} {sections['resolve_ball_collisions'] * 1000:>9.1f} "
+                f"{sections['resolve_line_collision'] * 1000:>9.1f} {sections['Hole.step'] * 1000:>9.1f}")
+        before = previous.get((result['rules'], result['shot']))
+        if before is not None:
+            line += f"  x{before['time_to_rest'] / result['time_to_rest']:.2f}"
+            if before['steps'] != result['steps']:
+                line += f" (steps were {before['steps']})"
+        if not result['deterministic']:
+            line += '  NOT DETERMINISTIC'
+        print(line)
+
+def main(argv: List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description='physics micro benchmark')
+    parser.add_argument('--out', help='write the results to this json file')
+    parser.add_argument('--compare', help='json file of an earlier run, prints the speedup of every shot')
+    parser.add_argument('--solver', choices=[solver.name for solver in Solver], default=Solver.FIXED_STEP.name)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(Solver[args.solver], args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(report, baseline)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
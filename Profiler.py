@@ -0,0 +1,112 @@
+'''
+hot path profiler. sections of the game loop are timed while profiling is on, shown as rolling averages
+in an overlay and exported as a chrome trace (chrome://tracing, perfetto) on exit. while off, a section
+costs a call returning a shared null context
+'''
+
+import json
+import pygame
+from collections import deque
+from contextlib import nullcontext, contextmanager
+from time import perf_counter_ns
+from typing import Dict, List, Tuple
+
+ROLLING_FRAMES = 60
+MAX_TRACE_EVENTS = 200000 # the oldest are dropped, about an hour of frames at ten sections each
+OVERLAY_COLOR = (255, 255, 0)
+
+_null = nullcontext()
+
+class Section:
+    ''' times one section into the profiler, reused for every entry of the same name '''
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.starts: List[int] = [] # sections of one name can nest
+
+    def __enter__(self):
+        self.starts.append(perf_counter_ns())
+
+    def __exit__(self, *args):
+        end = perf_counter_ns()
+        start = self.starts.pop()
+        self.profiler.record(self.name, start, end - start)
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.sections: Dict[str, Section] = {}
+        self.events: deque = deque(maxlen=MAX_TRACE_EVENTS) # (name, start ns, duration ns)
+        self.frame_totals: Dict[str, int] = {}
+        self.history: Dict[str, deque] = {} # total ns of every name per frame, for the last frames
+        self.origin = perf_counter_ns()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        # a frame cut in half by the toggle is not counted
+        self.frame_totals = {}
+
+    @contextmanager
+    def paused(self):
+        ''' nothing is timed inside, for work that is not the live game, like the shots a cpu simulates '''
+        enabled = self.enabled
+        self.enabled = False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def section(self, name: str):
+        if not self.enabled:
+            return _null
+        section = self.sections.get(name)
+        if section is None:
+            section = Section(self, name)
+            self.sections[name] = section
+        return section
+
+    def record(self, name: str, start: int, duration: int):
+        self.events.append((name, start, duration))
+        self.frame_totals[name] = self.frame_totals.get(name, 0) + duration
+
+    def frame(self):
+        ''' close the frame, its totals go into the rolling averages '''
+        if not self.enabled:
+            return
+        for name in self.frame_totals.keys() | self.history.keys():
+            history = self.history.get(name)
+            if history is None:
+                history = deque(maxlen=ROLLING_FRAMES)
+                self.history[name] = history
+            history.append(self.frame_totals.get(name, 0))
+        self.frame_totals = {}
+
+    def averages(self) -> List[Tuple[str, float]]:
+        ''' mean milliseconds per frame of every section over the last frames '''
+        return [(name, sum(history) / len(history) / 1e6) for name, history in self.history.items()]
+
+    def draw(self, win: pygame.Surface, font: pygame.font.Font) -> List[pygame.Rect]:
+        if not self.enabled:
+            return []
+        rects = []
+        x = win.get_width() - 10
+        y = 10
+        for name, average in self.averages():
+            surf = font.render(f'{name} {average:.2f} ms', True, OVERLAY_COLOR)
+            rects.append(win.blit(surf, (x - surf.get_width(), y)))
+            y += surf.get_height()
+        return rects
+
+    def export(self, path: str):
+        ''' the recorded sections as complete events of the chrome trace format, times in microseconds '''
+        trace = {
+            'traceEvents': [
+                {'name': name, 'ph': 'X', 'ts': (start - self.origin) / 1000, 'dur': duration / 1000, 'pid': 0, 'tid': 0}
+                for name, start, duration in self.events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+        with open(path, 'w') as file:
+            json.dump(trace, file)
+
+profiler = Profiler()
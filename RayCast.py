@@ -0,0 +1,171 @@
+'''
+ray queries against the table. a ray moving a ball's center is tested only against the balls, cushions and holes
+indexed in the grid cells it passes through, nearest hit first
+'''
+
+from math import sqrt, floor, inf
+from enum import Enum
+from typing import List, Tuple, Dict, Set
+from Physics import Ball, Line, Hole
+
+# pixels a ray has to close in on a ball along its direction to hit it. a ray leaving a contact along the tangent
+# is at zero up to rounding, without a margin it would hit the ball it just left again
+APPROACH_EPSILON = 1e-9
+
+class Hit(Enum):
+    BALL = 0
+    LINE = 1
+    HOLE = 2
+
+def ray_circle(origin_x: float, origin_y: float, dir_x: float, dir_y: float, center_x: float, center_y: float, radius: float) -> float:
+    '''
+    distance along the ray (direction normalized) until it is radius away from center, inf if it never gets there
+    or is moving away. a ray already inside and approaching hits right away
+    '''
+    rel_x = center_x - origin_x
+    rel_y = center_y - origin_y
+    along = rel_x * dir_x + rel_y * dir_y
+    if along <= APPROACH_EPSILON:
+        return inf
+    c = rel_x * rel_x + rel_y * rel_y - radius * radius
+    if c <= 0:
+        return 0.0
+    disc = along * along - c
+    if disc < 0:
+        return inf
+    return along - sqrt(disc)
+
+class RayIndex:
+    ''' the table for ray queries, balls as they are when built. cushions share the cells of Line._index '''
+    def __init__(self, positions: List[List[float]]):
+        if Line._index is None:
+            Line.build_index()
+        self.lines = Line._index
+        self.cell_size = self.lines.cell_size
+        self.positions = positions
+        self.holes = [(hole.pos[0], hole.pos[1], hole.radius) for hole in Hole._reg]
+        self.line_reach = Ball._radius + Line._radius
+
+        # the cell of every point a center can touch the ball or hole from, the lines are looked up in their own index
+        self.cells: Dict[Tuple[int, int], List[Tuple[Hit, int]]] = {}
+        for h, (x, y, radius) in enumerate(self.holes):
+            self.insert((Hit.HOLE, h), x, y, radius)
+        for i, (x, y) in enumerate(positions):
+            self.insert((Hit.BALL, i), x, y, Ball._radius * 2)
+
+    def insert(self, item: Tuple[Hit, int], x: float, y: float, reach: float):
+        cell_size = self.cell_size
+        for cx in range(floor((x - reach) / cell_size), floor((x + reach) / cell_size) + 1):
+            for cy in range(floor((y - reach) / cell_size), floor((y + reach) / cell_size) + 1):
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def ray_line(self, origin_x: float, origin_y: float, dir_x: float, dir_y: float, k: int) -> float:
+        ''' distance to contact with cushion k as a capsule, the flat side or either round end '''
+        lines = self.lines
+        reach = self.line_reach
+        start_x, start_y = lines.starts[k]
+        edge_x, edge_y = lines.edges[k]
+        normal_x, normal_y = lines.normals[k]
+        rel_x = origin_x - start_x
+        rel_y = origin_y - start_y
+
+        s = inf
+        height = rel_x * normal_x + rel_y * normal_y
+        rate = dir_x * normal_x + dir_y * normal_y
+        if height < 0:
+            height, rate = -height, -rate
+        if rate < 0:
+            s_side = max(height - reach, 0.0) / -rate
+            along = (rel_x + dir_x * s_side) * edge_x + (rel_y + dir_y * s_side) * edge_y
+            if 0 <= along <= lines.lengths_squared[k]:
+                s = s_side
+        s = min(s, ray_circle(origin_x, origin_y, dir_x, dir_y, start_x, start_y, reach))
+        s = min(s, ray_circle(origin_x, origin_y, dir_x, dir_y, start_x + edge_x, start_y + edge_y, reach))
+        return s
+
+    def line_normal(self, point: Tuple[float, float], k: int) -> Tuple[float, float]:
+        ''' unit normal of cushion k towards point, None on the line itself '''
+        lines = self.lines
+        start_x, start_y = lines.starts[k]
+        edge_x, edge_y = lines.edges[k]
+        rel_x = point[0] - start_x
+        rel_y = point[1] - start_y
+        t = min(max(rel_x * edge_x + rel_y * edge_y, 0.0), lines.lengths_squared[k]) / lines.lengths_squared[k]
+        normal_x = rel_x - t * edge_x
+        normal_y = rel_y - t * edge_y
+        distance = sqrt(normal_x * normal_x + normal_y * normal_y)
+        if distance == 0:
+            return None
+        return (normal_x / distance, normal_y / distance)
+
+    def distance_to(self, item: Tuple[Hit, int], origin_x: float, origin_y: float, dir_x: float, dir_y: float) -> float:
+        kind, index = item
+        if kind == Hit.BALL:
+            x, y = self.positions[index]
+            return ray_circle(origin_x, origin_y, dir_x, dir_y, x, y, Ball._radius * 2)
+        x, y, radius = self.holes[index]
+        return ray_circle(origin_x, origin_y, dir_x, dir_y, x, y, radius)
+
+    def cast(self, origin: Tuple[float, float], direction: Tuple[float, float], length: float, ignore: Set[int]=()) -> Tuple[float, Hit, int]:
+        '''
+        nearest hit of a ball center leaving origin along direction (normalized) within length,
+        as (distance, kind, index), None if nothing is hit. balls in ignore are not in the way
+        '''
+        origin_x, origin_y = origin
+        dir_x, dir_y = direction
+        cell_size = self.cell_size
+        cx = floor(origin_x / cell_size)
+        cy = floor(origin_y / cell_size)
+
+        # walk the cells the ray passes through in order, s_x and s_y are the distances to the next cell boundaries
+        step_x = 1 if dir_x > 0 else -1
+        step_y = 1 if dir_y > 0 else -1
+        if dir_x != 0:
+            s_x = ((cx + (dir_x > 0)) * cell_size - origin_x) / dir_x
+            delta_x = cell_size / abs(dir_x)
+        else:
+            s_x = delta_x = inf
+        if dir_y != 0:
+            s_y = ((cy + (dir_y > 0)) * cell_size - origin_y) / dir_y
+            delta_y = cell_size / abs(dir_y)
+        else:
+            s_y = delta_y = inf
+
+        best = None
+        best_s = length
+        tested = set()
+        tested_lines = set()
+        while True:
+            for item in self.cells.get((cx, cy), ()):
+                if item in tested:
+                    continue
+                tested.add(item)
+                if item[0] == Hit.BALL and item[1] in ignore:
+                    continue
+                s = self.distance_to(item, origin_x, origin_y, dir_x, dir_y)
+                if s <= best_s:
+                    best_s = s
+                    best = item
+            for k in self.lines.cells.get((cx, cy), ()):
+                if k in tested_lines:
+                    continue
+                tested_lines.add(k)
+                s = self.ray_line(origin_x, origin_y, dir_x, dir_y, k)
+                if s <= best_s:
+                    best_s = s
+                    best = (Hit.LINE, k)
+
+            # every hit closer than the exit of this cell has been tested
+            exit_s = min(s_x, s_y)
+            if exit_s >= best_s:
+                break
+            if s_x < s_y:
+                cx += step_x
+                s_x += delta_x
+            else:
+                cy += step_y
+                s_y += delta_y
+
+        if best is None:
+            return None
+        return (best_s, best[0], best[1])
@@ -0,0 +1,78 @@
+'''
+rendering modes for the game window. the dirty rectangle renderer keeps the table layer cached and only
+redraws and updates the parts of the window that changed since the last frame
+'''
+
+import pygame
+from enum import Enum
+from typing import List, Dict, Tuple, Callable
+from Physics import Ball
+
+# the rects returned by pygame.draw can be short of thick lines by a pixel
+OVERLAY_MARGIN = 4
+
+class RenderMode(Enum):
+    FULL = 0
+    DIRTY_RECTS = 1
+
+class DirtyRenderer:
+    '''
+    the window is the table layer (with the holes and lines when drawn), the balls and the overlays (guides, cue, hud) on top.
+    every frame, the rects of balls that moved and of last frame's overlays are redrawn from the table layer up,
+    then the overlays are drawn again and only the rects touched are passed to display.update
+    '''
+    def __init__(self, win: pygame.Surface, table_layer: pygame.Surface):
+        self.win = win
+        self.table_layer = table_layer
+        self.ball_rects: Dict[Ball, pygame.Rect] = {}
+        self.ball_blits: Dict[Ball, List[Tuple[pygame.Surface, pygame.Rect]]] = {} # a ball is redrawn when any of its blits changed
+        self.overlay_rects: List[pygame.Rect] = []
+        self.full_redraw = True
+
+    def invalidate(self, table_layer: pygame.Surface=None):
+        ''' redraw the whole window next frame '''
+        if table_layer is not None:
+            self.table_layer = table_layer
+        self.full_redraw = True
+
+    def draw_table(self, rect: pygame.Rect):
+        ''' redraw the table inside rect from the layer up, in the order of a full frame '''
+        self.win.set_clip(rect)
+        self.win.blit(self.table_layer, rect, rect)
+        balls = [ball for ball, ball_rect in self.ball_rects.items() if ball_rect.colliderect(rect)]
+        for ball in balls:
+            ball.draw_shadows()
+        for ball in balls:
+            ball.draw()
+        self.win.set_clip(None)
+
+    def get_overlay_rects(self, draw_overlays: Callable[[], List[pygame.Rect]]) -> List[pygame.Rect]:
+        return [rect.inflate(OVERLAY_MARGIN, OVERLAY_MARGIN) for rect in draw_overlays()]
+
+    def render(self, draw_overlays: Callable[[], List[pygame.Rect]]):
+        previous, previous_blits = self.ball_rects, self.ball_blits
+        self.ball_blits = {ball: ball.get_rects() for ball in Ball._reg}
+        self.ball_rects = {ball: pygame.Rect(blits[0][1]).unionall([rect for surf, rect in blits[1:]]) for ball, blits in self.ball_blits.items()}
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.draw_table(self.win.get_rect())
+            self.overlay_rects = self.get_overlay_rects(draw_overlays)
+            pygame.display.update()
+            return
+
+        # old and new places of balls that moved, potted or placed, and whatever the overlays covered
+        dirty = list(self.overlay_rects)
+        for ball, rect in self.ball_rects.items():
+            if previous_blits.get(ball) != self.ball_blits[ball]:
+                dirty.append(rect)
+                if ball in previous:
+                    dirty.append(previous[ball])
+        for ball, old_rect in previous.items():
+            if ball not in self.ball_rects:
+                dirty.append(old_rect)
+
+        for rect in dirty:
+            self.draw_table(rect)
+        self.overlay_rects = self.get_overlay_rects(draw_overlays)
+        pygame.display.update(dirty + self.overlay_rects)
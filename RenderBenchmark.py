@@ -0,0 +1,154 @@
+'''
+rendering benchmark. plays a seeded cpu against cpu game offscreen with the sdl dummy video driver and times
+every part of the draw phase of main_loop separately, frame by frame. the game itself ticks between frames
+and is not timed
+
+    python RenderBenchmark.py --frames 600 --rules SNOOKER --out render.json
+'''
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import sys
+import json
+import random
+import argparse
+from time import perf_counter
+from typing import List, Dict
+import numpy as np
+import pygame
+import Physics
+from Physics import Ball, Line
+from StateMachine import Rules, Player, Player_Type, State
+import Main
+import Cpu
+import Guide
+
+FRAMES = 600
+SEED = 0
+PERCENTILES = [50, 90, 99]
+
+# in the order of a full frame. lines are part of the table layer in the game, they are drawn on their own here
+# with draw_solids forced on, to see what they would cost every frame
+COMPONENTS = ['table', 'lines', 'shadows', 'balls', 'guide', 'cpu_debug', 'hud', 'display']
+
+def draw_lines():
+    ''' the lines whether or not draw_solids is set, draw_lines skips them otherwise '''
+    draw_solids = Physics.draw_solids
+    Physics.draw_solids = True
+    try:
+        Line.draw_lines()
+    finally:
+        Physics.draw_solids = draw_solids
+
+def draw_frame(game: Main.PoolGame, times: Dict[str, List[float]]):
+    ''' the full draw of main_loop, a part at a time '''
+    def timed(name: str, draw):
+        start = perf_counter()
+        draw()
+        times[name].append(perf_counter() - start)
+
+    timed('table', lambda: game.win.blit(game.table_layer, (0, 0)))
+    timed('lines', draw_lines)
+    timed('shadows', lambda: [ball.draw_shadows() for ball in Ball._reg])
+    timed('balls', lambda: [ball.draw() for ball in Ball._reg])
+    if game.game_state.get_state() == State.PLAY:
+        timed('guide', game.guide.draw)
+    timed('cpu_debug', lambda: [cpu.draw() for cpu in game.cpus])
+    timed('hud', game.draw_hud)
+    timed('display', pygame.display.update)
+
+def run_benchmark(rules: Rules=Rules.EIGHT_BALL, frames: int=FRAMES, seed: int=SEED, solids: bool=False) -> Dict:
+    pygame.init()
+    win = pygame.display.set_mode((1280, 800))
+    Main.font1 = pygame.font.SysFont('Arial', 16)
+    Physics.win = win
+    Physics.initialize()
+    Cpu.win = win
+    Guide.win = win
+
+    random.seed(seed)
+    cpu_config = {
+        Player.PLAYER_1: (Player_Type.CPU, 3),
+        Player.PLAYER_2: (Player_Type.CPU, 3),
+    }
+    # the game falls back to draw_solids without its sprites, either way the flag is put back after
+    draw_solids = Physics.draw_solids
+    times: Dict[str, List[float]] = {name: [] for name in COMPONENTS}
+    totals = []
+    try:
+        game = Main.PoolGame(rules, cpu_config=cpu_config, win=win, clock=None)
+        game.initialize()
+        for cpu in game.cpus:
+            # plan in this process, the planning is not timed anyway
+            cpu.background = False
+        if solids and not Physics.draw_solids:
+            Physics.draw_solids = True
+            game.table_layer = game.build_table_layer()
+
+        for frame in range(frames):
+            game.tick()
+            pygame.event.pump()
+            start = perf_counter()
+            draw_frame(game, times)
+            totals.append(perf_counter() - start)
+        game.close()
+    finally:
+        Physics.draw_solids = draw_solids
+
+    def summary(samples: List[float]) -> Dict:
+        if not samples:
+            return {'frames': 0}
+        result = {'frames': len(samples), 'mean_ms': float(np.mean(samples)) * 1000, 'max_ms': max(samples) * 1000}
+        for p in PERCENTILES:
+            result[f'p{p}_ms'] = float(np.percentile(samples, p)) * 1000
+        return result
+
+    return {
+        'meta': {
+            'rules': rules.name,
+            'frames': frames,
+            'seed': seed,
+            'draw_solids': solids,
+            'sprites_loaded': game.sprites_loaded,
+            'video_driver': pygame.display.get_driver(),
+            'pygame': pygame.version.ver,
+        },
+        'frame': summary(totals),
+        'components': {name: summary(samples) for name, samples in times.items()},
+    }
+
+def print_results(report: Dict):
+    meta = report['meta']
+    print(f"{meta['rules']}, {meta['frames']} frames, draw_solids {meta['draw_solids']}, video driver {meta['video_driver']}")
+    columns = ['mean_ms'] + [f'p{p}_ms' for p in PERCENTILES] + ['max_ms']
+    print(f"{'part':<10} {'frames':>6} " + ' '.join(f'{column[:-3]:>7}' for column in columns) + '  share')
+    frame_mean = report['frame']['mean_ms']
+    rows = list(report['components'].items()) + [('frame', report['frame'])]
+    for name, result in rows:
+        if not result['frames']:
+            print(f'{name:<10} {0:>6}')
+            continue
+        # share of the mean frame, parts that do not draw every frame count over all frames
+        share = result['mean_ms'] * result['frames'] / meta['frames'] / frame_mean
+        print(f"{name:<10} {result['frames']:>6} " + ' '.join(f'{result[column]:>7.3f}' for column in columns) + f'  {share:>5.0%}')
+
+def main(argv: List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description='offscreen rendering benchmark, times in milliseconds')
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--rules', choices=[Rules.EIGHT_BALL.name, Rules.SNOOKER.name], default=Rules.EIGHT_BALL.name)
+    parser.add_argument('--solids', action='store_true', help='draw the holes and lines over the table sprites')
+    parser.add_argument('--out', help='write the results to this json file')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(Rules[args.rules], args.frames, args.seed, args.solids)
+    print_results(report)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+    pygame.quit()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
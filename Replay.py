@@ -0,0 +1,343 @@
+'''
+match replays. a replay stores the shots and cue ball placements of a match with the number of physics ticks
+before each, and the game state at the end of every turn. playing it back re-simulates the match, so a whole
+frame takes a few kilobytes. periodic keyframes of the table and game state allow seeking to any turn
+'''
+
+import struct
+from enum import Enum
+from typing import BinaryIO, List, Tuple, Dict, Iterator
+from pygame.math import Vector2
+from Physics import Ball, CueBall, TableState, World, Solver
+from StateMachine import GameState, GameStateSnooker, Rules, State, Player, Foul, BallType, SnookerInnerState, create_game_state
+import Simulation
+import Table
+
+MAGIC = b'PLRP'
+VERSION = 1
+KEYFRAME_INTERVAL = 10 # turns
+EXTENSION = '.plrp'
+NO_VALUE = 255 # an enum field that is None
+
+# little endian, no padding
+HEADER = struct.Struct('<4sBBBddd') # magic, version, rules, solver, table center x, y, pool line
+RECORD_KIND = struct.Struct('<B')
+RECORD_SIZE = struct.Struct('<I') # keyframes only, the other records have a fixed size
+SHOT = struct.Struct('<Iddd') # ticks before, direction x, y, power
+PLACE = struct.Struct('<Idd') # ticks before, cue ball x, y
+TURN = struct.Struct('<IBBBBiiI') # ticks of the shot, state, player, foul, winner, score of player one, two, round count
+KEYFRAME = struct.Struct('<III') # turn, balls, entered, then numbers, positions, entered numbers and the game state
+BALL_NUMBER = struct.Struct('<h')
+BALL_POSITION = struct.Struct('<dd')
+# state, player, ball type of player one, two, determined, first touch, winner, last foul, inner state,
+# inner state at the end of the turn, current ball, reds on, red count, score of player one, two, round count,
+# potted this turn. the snooker fields are left at their defaults for other rules
+GAME_STATE = struct.Struct('<BBBB?BBBBBB?IiiIB')
+BALL_TYPE = struct.Struct('<B')
+
+def enum_value(member: Enum) -> int:
+    return NO_VALUE if member is None else member.value
+
+def enum_member(kind, value: int):
+    return None if value == NO_VALUE else kind(value)
+
+def pack_game_state(game_state: GameState) -> bytes:
+    ''' the fields of the game state one by one, a replay never holds objects '''
+    snooker = isinstance(game_state, GameStateSnooker)
+    data = [GAME_STATE.pack(
+        game_state.current_state.value,
+        game_state.player_turn.value,
+        enum_value(game_state.player_ball_type[Player.PLAYER_1]),
+        enum_value(game_state.player_ball_type[Player.PLAYER_2]),
+        game_state.player_determined,
+        enum_value(game_state.first_touch),
+        enum_value(game_state.player_winner),
+        game_state.last_foul.value,
+        enum_value(game_state.inner_state),
+        enum_value(game_state.inner_state_end_of_turn) if snooker else NO_VALUE,
+        enum_value(game_state.current_ball),
+        game_state.reds_are_on if snooker else False,
+        game_state.red_count if snooker else 0,
+        game_state.score[Player.PLAYER_1],
+        game_state.score[Player.PLAYER_2],
+        game_state.round_count,
+        len(game_state.potted_this_turn),
+    )]
+    data += [BALL_TYPE.pack(ball_type.value) for ball_type in game_state.potted_this_turn]
+    return b''.join(data)
+
+def unpack_game_state(data: bytes, rules: Rules, table_dims: Dict[str, float]) -> GameState:
+    (state, player, ball_type_1, ball_type_2, determined, first_touch, winner, last_foul, inner_state,
+     inner_state_end_of_turn, current_ball, reds_are_on, red_count, score_1, score_2, round_count, potted) = GAME_STATE.unpack_from(data)
+    if len(data) != GAME_STATE.size + potted * BALL_TYPE.size:
+        raise ValueError('game state record has the wrong size')
+    game_state = create_game_state(rules, table_dims)
+    if game_state is None:
+        raise ValueError(f'no game state for {rules}')
+    game_state.current_state = State(state)
+    game_state.player_turn = Player(player)
+    game_state.player_ball_type = {Player.PLAYER_1: enum_member(BallType, ball_type_1), Player.PLAYER_2: enum_member(BallType, ball_type_2)}
+    game_state.player_determined = determined
+    game_state.first_touch = enum_member(BallType, first_touch)
+    game_state.player_winner = enum_member(Player, winner)
+    game_state.last_foul = Foul(last_foul)
+    game_state.inner_state = enum_member(SnookerInnerState, inner_state)
+    game_state.current_ball = enum_member(BallType, current_ball)
+    if isinstance(game_state, GameStateSnooker):
+        game_state.inner_state_end_of_turn = enum_member(SnookerInnerState, inner_state_end_of_turn)
+        game_state.reds_are_on = reds_are_on
+        game_state.red_count = red_count
+    game_state.score = {Player.PLAYER_1: score_1, Player.PLAYER_2: score_2}
+    game_state.round_count = round_count
+    game_state.potted_this_turn = [BallType(BALL_TYPE.unpack_from(data, GAME_STATE.size + i * BALL_TYPE.size)[0]) for i in range(potted)]
+    return game_state
+
+class Record(Enum):
+    SHOT = 0
+    PLACE = 1
+    TURN = 2
+    KEYFRAME = 3
+
+class Keyframe:
+    ''' the table and game state at the start of a turn, the table is at rest '''
+    def __init__(self, turn: int, table_state: TableState, game_state: GameState):
+        self.turn = turn
+        self.table_state = table_state
+        self.game_state = game_state
+
+    def pack(self) -> bytes:
+        table_state = self.table_state
+        data = [KEYFRAME.pack(self.turn, len(table_state.numbers), len(table_state.entered))]
+        data += [BALL_NUMBER.pack(number) for number in table_state.numbers]
+        data += [BALL_POSITION.pack(x, y) for x, y in table_state.positions.tolist()]
+        data += [BALL_NUMBER.pack(number) for number in table_state.entered]
+        data.append(pack_game_state(self.game_state))
+        return b''.join(data)
+
+    @staticmethod
+    def unpack(data: bytes, rules: Rules, table_dims: Dict[str, float]) -> 'Keyframe':
+        turn, balls, entered = KEYFRAME.unpack_from(data)
+        offset = KEYFRAME.size
+        numbers = [BALL_NUMBER.unpack_from(data, offset + i * BALL_NUMBER.size)[0] for i in range(balls)]
+        offset += balls * BALL_NUMBER.size
+        positions = [BALL_POSITION.unpack_from(data, offset + i * BALL_POSITION.size) for i in range(balls)]
+        offset += balls * BALL_POSITION.size
+        entered_numbers = [BALL_NUMBER.unpack_from(data, offset + i * BALL_NUMBER.size)[0] for i in range(entered)]
+        offset += entered * BALL_NUMBER.size
+        game_state = unpack_game_state(data[offset:], rules, table_dims)
+        return Keyframe(turn, TableState(numbers, positions, entered=entered_numbers), game_state)
+
+class TurnSummary:
+    ''' what a turn ended with, recorded and compared on playback '''
+    def __init__(self, ticks: int, state: State, player: Player, foul: Foul, winner: Player, score: Tuple[int, int], round_count: int):
+        self.ticks = ticks
+        self.state = state
+        self.player = player
+        self.foul = foul
+        self.winner = winner
+        self.score = score
+        self.round_count = round_count
+
+    def __eq__(self, other):
+        return isinstance(other, TurnSummary) and self.pack() == other.pack()
+
+    def __repr__(self):
+        return f'TurnSummary({self.ticks}, {self.state}, {self.player}, {self.foul}, {self.winner}, {self.score}, {self.round_count})'
+
+    def same_result(self, other: 'TurnSummary') -> bool:
+        ''' same score, winner and round count '''
+        return self.score == other.score and self.winner == other.winner and self.round_count == other.round_count
+
+    @staticmethod
+    def of(game_state: GameState, ticks: int) -> 'TurnSummary':
+        score = (game_state.score[Player.PLAYER_1], game_state.score[Player.PLAYER_2])
+        return TurnSummary(ticks, game_state.get_state(), game_state.get_player(), game_state.last_foul, game_state.player_winner, score, game_state.round_count)
+
+    def pack(self) -> bytes:
+        winner = enum_value(self.winner)
+        return TURN.pack(self.ticks, self.state.value, self.player.value, self.foul.value, winner, self.score[0], self.score[1], self.round_count)
+
+    @staticmethod
+    def unpack(data: bytes) -> 'TurnSummary':
+        ticks, state, player, foul, winner, score_1, score_2, round_count = TURN.unpack(data)
+        winner = enum_member(Player, winner)
+        return TurnSummary(ticks, State(state), Player(player), Foul(foul), winner, (score_1, score_2), round_count)
+
+class ReplayRecorder:
+    '''
+    appends a match to a binary stream as it is played. the game calls tick every physics tick,
+    and shot, place and end_turn as they happen. every record is flushed, so a crashed match keeps its turns
+    '''
+    def __init__(self, stream: BinaryIO, keyframe_interval: int=KEYFRAME_INTERVAL):
+        self.stream = stream
+        self.keyframe_interval = keyframe_interval
+        self.ticks = 0
+        self.turn = 0
+
+    def write(self, kind: Record, data: bytes):
+        self.stream.write(RECORD_KIND.pack(kind.value))
+        if kind == Record.KEYFRAME:
+            self.stream.write(RECORD_SIZE.pack(len(data)))
+        self.stream.write(data)
+        self.stream.flush()
+
+    def start(self, rules: Rules, solver: Solver, game_state: GameState, table_center: Vector2=Table.TABLE_CENTER, pool_line: float=Table.POOL_LINE):
+        ''' header and the opening table, the rack is shuffled so it is always a keyframe '''
+        self.stream.write(HEADER.pack(MAGIC, VERSION, rules.value, solver.value, table_center[0], table_center[1], pool_line))
+        self.keyframe(game_state)
+
+    def keyframe(self, game_state: GameState):
+        self.write(Record.KEYFRAME, Keyframe(self.turn, TableState.snapshot(), game_state).pack())
+
+    def tick(self):
+        self.ticks += 1
+
+    def shot(self, direction: Vector2, power: float):
+        self.write(Record.SHOT, SHOT.pack(self.ticks, direction[0], direction[1], power))
+        self.ticks = 0
+
+    def place(self, pos: Vector2):
+        self.write(Record.PLACE, PLACE.pack(self.ticks, pos[0], pos[1]))
+        self.ticks = 0
+
+    def end_turn(self, game_state: GameState):
+        self.write(Record.TURN, TurnSummary.of(game_state, self.ticks).pack())
+        self.ticks = 0
+        self.turn += 1
+        if self.turn % self.keyframe_interval == 0:
+            self.keyframe(game_state)
+
+    def close(self):
+        self.stream.close()
+
+def read_header(stream: BinaryIO) -> Tuple[Rules, Solver, Vector2, float]:
+    data = stream.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError('not a replay, the header is cut short')
+    magic, version, rules, solver, center_x, center_y, pool_line = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError('not a replay')
+    if version != VERSION:
+        raise ValueError(f'replay version {version} is not supported')
+    return Rules(rules), Solver(solver), Vector2(center_x, center_y), pool_line
+
+def read_records(stream: BinaryIO) -> Iterator[Tuple[Record, bytes]]:
+    ''' records as they come, a record cut short at the end of a stream still being written is left out '''
+    sizes = {Record.SHOT: SHOT.size, Record.PLACE: PLACE.size, Record.TURN: TURN.size}
+    while True:
+        kind = stream.read(RECORD_KIND.size)
+        if not kind:
+            return
+        kind = Record(RECORD_KIND.unpack(kind)[0])
+        if kind == Record.KEYFRAME:
+            size = stream.read(RECORD_SIZE.size)
+            if len(size) < RECORD_SIZE.size:
+                return
+            size = RECORD_SIZE.unpack(size)[0]
+        else:
+            size = sizes[kind]
+        data = stream.read(size)
+        if len(data) < size:
+            return
+        yield kind, data
+
+class ReplayPlayer:
+    '''
+    plays a recorded match back by re-simulating it headlessly, in a world of its own.
+    step_turn plays one turn, seek jumps to the start of any turn from the keyframe before it
+    '''
+    def __init__(self, stream: BinaryIO):
+        self.rules, self.solver, self.table_center, self.pool_line = read_header(stream)
+        self.records: List[Tuple[Record, bytes]] = list(read_records(stream))
+
+        # index of the first record of every turn, and the keyframes by turn
+        self.turn_starts: List[int] = [0]
+        self.keyframes: Dict[int, int] = {}
+        for i, (kind, data) in enumerate(self.records):
+            if kind == Record.TURN:
+                self.turn_starts.append(i + 1)
+            elif kind == Record.KEYFRAME:
+                self.keyframes[KEYFRAME.unpack_from(data)[0]] = i
+        if 0 not in self.keyframes:
+            raise ValueError('replay has no opening keyframe')
+
+        self.world = World([], [])
+        with self.world.active():
+            self.table_dims = Table.build_table(self.table_center, self.pool_line)
+        self.game_state: GameState = None
+        self.turn = 0
+        self.seek(0)
+
+    def turn_count(self) -> int:
+        ''' turns completed in the recording '''
+        return len(self.turn_starts) - 1
+
+    def recorded_summary(self, turn: int) -> TurnSummary:
+        ''' how turn ended in the recording '''
+        return TurnSummary.unpack(self.records[self.turn_starts[turn + 1] - 1][1])
+
+    def seek(self, turn: int):
+        ''' the table and game state at the start of turn '''
+        if not 0 <= turn <= self.turn_count():
+            raise ValueError(f'turn {turn} is not in the replay')
+        start = max(t for t in self.keyframes if t <= turn)
+        keyframe = Keyframe.unpack(self.records[self.keyframes[start]][1], self.rules, self.table_dims)
+        with self.world.active():
+            keyframe.table_state.restore()
+        self.game_state = keyframe.game_state
+        self.turn = start
+        while self.turn < turn:
+            self.step_turn()
+
+    def run_ticks(self, ticks: int):
+        for i in range(ticks):
+            Simulation.step_frame(self.solver)
+
+    def play_shot(self) -> int:
+        ''' ticks until the table comes to rest, the same as the game loop '''
+        ticks = 0
+        while True:
+            Simulation.step_frame(self.solver)
+            ticks += 1
+            if Ball.check_stability() or ticks >= Simulation.MAX_FRAMES:
+                Simulation.end_turn(self.game_state, self.table_center, self.pool_line)
+                return ticks
+
+    def step_turn(self) -> bool:
+        ''' play the next turn, False when the game state it ends with is not the recorded one '''
+        if self.turn >= self.turn_count():
+            raise ValueError('replay is over')
+        matches = True
+        ticks = 0
+        with self.world.active():
+            for kind, data in self.records[self.turn_starts[self.turn]:self.turn_starts[self.turn + 1]]:
+                match kind:
+                    case Record.PLACE:
+                        before, x, y = PLACE.unpack(data)
+                        self.run_ticks(before)
+                        if Ball._cue_ball.is_out:
+                            CueBall(Vector2(x, y))
+                        else:
+                            Ball._cue_ball.set_pos(Vector2(x, y))
+                        self.game_state.update()
+                    case Record.SHOT:
+                        before, x, y, power = SHOT.unpack(data)
+                        self.run_ticks(before)
+                        Ball._cue_ball.strike(Vector2(x, y), power)
+                        self.game_state.update()
+                        ticks = self.play_shot()
+                    case Record.TURN:
+                        matches = TurnSummary.unpack(data) == TurnSummary.of(self.game_state, ticks)
+        self.turn += 1
+        return matches
+
+    def play(self) -> int:
+        ''' play to the end, returns the number of turns that did not end as recorded '''
+        mismatches = 0
+        while self.turn < self.turn_count():
+            mismatches += not self.step_turn()
+        return mismatches
+
+    def table_state(self) -> TableState:
+        with self.world.active():
+            return TableState.snapshot()
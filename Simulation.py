@@ -0,0 +1,156 @@
+'''
+headless simulation module. runs shots to rest as fast as possible, without a window, surfaces or fonts
+'''
+
+from contextlib import contextmanager
+from multiprocessing import Pool
+from random import Random
+from typing import List, Tuple, Iterator
+from pygame.math import Vector2
+from Physics import Ball, World, Line, Hole, TableState, Solver
+from StateMachine import BallType, GameState
+import EventSolver
+import Table
+from Profiler import profiler
+from Events import events, NullSink
+
+MAX_FRAMES = 60 * 60 # a minute of game time, a shot that is still rolling by then is cut short
+
+class ShotOutcome:
+    def __init__(self, table_state: TableState, potted: List[BallType], first_touch: BallType, steps: int):
+        self.table_state = table_state
+        self.potted = potted
+        self.first_touch = first_touch
+        self.steps = steps # frames for the fixed step solver, events for the event driven one
+
+    def __repr__(self):
+        return f'ShotOutcome(potted={self.potted}, first_touch={self.first_touch}, steps={self.steps})'
+
+    def is_cue_potted(self) -> bool:
+        return BallType.BALL_CUE in self.potted
+
+def step_frame(solver: Solver=Solver.FIXED_STEP):
+    ''' advance the table by one frame '''
+    match solver:
+        case Solver.FIXED_STEP:
+            with profiler.section('step_balls'):
+                Ball.step_balls()
+            with profiler.section('Hole.step'):
+                for hole in Hole._reg:
+                    hole.step()
+        case Solver.EVENT_DRIVEN:
+            # pockets are events of the solver, no pull from Hole.step
+            with profiler.section('step_balls'):
+                EventSolver.step_balls()
+
+def run_to_rest(solver: Solver=Solver.FIXED_STEP) -> int:
+    match solver:
+        case Solver.FIXED_STEP:
+            frames = 0
+            while not Ball.check_stability() and frames < MAX_FRAMES:
+                step_frame(solver)
+                frames += 1
+            # a ball caught by a hole on the last frame still belongs to this shot
+            for ball in Ball._ball_to_remove:
+                ball.potted()
+            Ball._ball_to_remove.clear()
+            return frames
+        case Solver.EVENT_DRIVEN:
+            return EventSolver.settle()
+
+def end_turn(game_state: GameState, table_center: Vector2=Table.TABLE_CENTER, pool_line: float=Table.POOL_LINE):
+    ''' the table came to rest after a shot, score it and set up the next turn '''
+    game_state.update_potted(Ball._cue_ball.get_potted_this_turn())
+    game_state.first_touch = Ball._cue_ball.get_first_touch()
+    game_state.update()
+    Table.respot_balls(game_state.get_respot(), table_center, pool_line)
+    Ball._cue_ball.new_turn()
+
+@contextmanager
+def isolated_balls():
+    '''
+    run in an empty world on the same table, the balls of the running game are put back after.
+    nothing in it is a game event or live physics to the profiler. the registries are class level,
+    so this is not thread safe
+    '''
+    with World().active(), events.muted(), profiler.paused():
+        yield
+
+def ensure_table():
+    ''' headless processes have no PoolGame to build the table '''
+    if not Line._reg:
+        Table.build_table()
+
+def simulate_shot(table_state: TableState, direction: Vector2, power: float, solver: Solver=Solver.FIXED_STEP) -> ShotOutcome:
+    ''' strike the cue ball of table_state and run the table to rest, the live table is left untouched '''
+    ensure_table()
+    with isolated_balls():
+        table_state.place()
+        if Ball._cue_ball is None:
+            raise ValueError('table state has no cue ball')
+        Ball._cue_ball.strike(Vector2(direction), power)
+        steps = run_to_rest(solver)
+        return ShotOutcome(TableState.capture(), list(Ball._potted_this_turn), Ball._first_cue_touch, steps)
+
+def perturb_shots(shots: List[Tuple[Vector2, float]], seed: int, noise: float) -> List[Tuple[Vector2, float]]:
+    '''
+    execution error for each shot, drawn from its own generator so the result only depends on the seed
+    and the position of the shot in the list. noise is the spread of the angle in radians and of the relative power
+    '''
+    if noise == 0:
+        return [(Vector2(direction), power) for direction, power in shots]
+    result = []
+    for index, (direction, power) in enumerate(shots):
+        rng = Random(f'{seed}-{index}')
+        direction = Vector2(direction).rotate_rad(rng.gauss(0, noise))
+        power = min(max(power * (1 + rng.gauss(0, noise)), 0.0), 1.0)
+        result.append((direction, power))
+    return result
+
+def _init_worker(table_center: Tuple[float, float], pool_line: float):
+    # a forked worker may have inherited the table of its parent
+    Line._reg.clear()
+    Hole._reg.clear()
+    Table.build_table(Vector2(table_center), pool_line)
+    # and its event sink, shots simulated here are not game events. it is left unflushed for the parent
+    events.set_sink(NullSink())
+
+def _simulate_task(task) -> ShotOutcome:
+    table_state, direction, power, solver = task
+    return simulate_shot(table_state, Vector2(direction), power, solver)
+
+class ShotPool:
+    '''
+    worker processes for simulating many shots from one table. every worker has its own copy
+    of the class level registries, so shots can run side by side. use as a context manager
+    '''
+    def __init__(self, processes: int=None, solver: Solver=Solver.FIXED_STEP, table_center: Vector2=Table.TABLE_CENTER, pool_line: float=Table.POOL_LINE):
+        self.solver = solver
+        self.pool = Pool(processes, initializer=_init_worker, initargs=((table_center[0], table_center[1]), pool_line))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def _tasks(self, table_state: TableState, shots: List[Tuple[Vector2, float]], seed: int, noise: float):
+        return [(table_state, (direction[0], direction[1]), power, self.solver) for direction, power in perturb_shots(shots, seed, noise)]
+
+    def simulate(self, table_state: TableState, shots: List[Tuple[Vector2, float]], seed: int=0, noise: float=0.0) -> List[ShotOutcome]:
+        ''' outcomes in the order of shots '''
+        return self.pool.map(_simulate_task, self._tasks(table_state, shots, seed, noise))
+
+    def iter_simulate(self, table_state: TableState, shots: List[Tuple[Vector2, float]], seed: int=0, noise: float=0.0) -> Iterator[ShotOutcome]:
+        ''' outcomes in the order of shots, as soon as each one is ready '''
+        return self.pool.imap(_simulate_task, self._tasks(table_state, shots, seed, noise))
+
+def simulate_batch(table_state: TableState, shots: List[Tuple[Vector2, float]], seed: int=0, noise: float=0.0,
+                   solver: Solver=Solver.FIXED_STEP, processes: int=None) -> List[ShotOutcome]:
+    ''' one off batch on a fresh pool, keep a ShotPool around when simulating every turn '''
+    with ShotPool(processes, solver) as pool:
+        return pool.simulate(table_state, shots, seed, noise)
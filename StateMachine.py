@@ -4,6 +4,7 @@ State machine module and rules enforecement
 
 from enum import Enum
 from typing import List
+from Events import events, Event
 
 class State(Enum):
     PLAY = 0
@@ -81,6 +82,7 @@ snooker_score_table = {
 class Player_Type(Enum):
     HUMAN = 0
     CPU = 1
+    CPU_MCTS = 2
 
 class Player(Enum):
     PLAYER_1 = 0
@@ -136,6 +138,7 @@ class GameState:
 
         self.inner_state = None
         self.current_ball: BallType = None
+        self.last_foul: Foul = Foul.NONE
     
     def get_state(self) -> State:
         return self.current_state
@@ -159,6 +162,16 @@ class GameState:
     def get_respot(self) -> List[BallType]:
         return []
 
+    def emit_end_of_turn(self, next_state: State):
+        ''' the turn that just ended into the event stream '''
+        if not events.enabled:
+            return
+        score = (self.score[Player.PLAYER_1], self.score[Player.PLAYER_2])
+        events.emit(Event.TURN_CHANGE, state=next_state, player=self.player_turn, score=score, round=self.round_count,
+                    first_touch=self.first_touch, potted=list(self.potted_this_turn))
+        if next_state == State.GAME_OVER:
+            events.emit(Event.GAME_OVER, winner=self.player_winner, score=score, round=self.round_count)
+
 class GameStateSnooker(GameState):
     def __init__(self, table_dims):
         super().__init__(table_dims)
@@ -224,9 +237,6 @@ class GameStateSnooker(GameState):
                 advance_turn = True
                 foul = Foul.NONE
 
-                print(f'{self.first_touch=}')
-                print(f'{self.potted_this_turn=}')
-
                 # determine state cases
                 self.inner_state_end_of_turn = SnookerInnerState.SNOOKER_RED_ON
                 if not self.is_red_done():
@@ -331,8 +341,9 @@ class GameStateSnooker(GameState):
                             self.inner_state = SnookerInnerState.SNOOKER_FREE_BALL
 
                 # resolve foul
+                self.last_foul = foul
                 if foul != Foul.NONE:
-                    print(f'{self.get_player()}, foul:{foul}')
+                    events.emit(Event.FOUL, player=self.get_player(), foul=foul)
                 match foul:
                     case Foul.POTTED_CUE:
                         next_state = State.MOVING_CUE_BALL
@@ -347,8 +358,8 @@ class GameStateSnooker(GameState):
 
                 if advance_turn:
                     self.player_turn = self.player_turn.next()
-                print(f'State: {next_state}, turn: {self.player_turn}, score: {self.score}')
                 self.round_count += 1
+                self.emit_end_of_turn(next_state)
 
             case State.MOVING_CUE_BALL:
                 next_state = State.PLAY
@@ -357,7 +368,6 @@ class GameStateSnooker(GameState):
                 next_state = State.GAME_OVER
         
         self.current_state = next_state
-        print(f'--------------End of turn, state: {self.inner_state}')
 
 class GameStateEightBall(GameState):
     def update_potted(self, potted: List[BallType]):
@@ -395,8 +405,6 @@ class GameStateEightBall(GameState):
                 ## player turn shall change if
                 ## 1. player didnt touch any of his balls first
                 ## 2. player potted cue or black
-                print(f'{self.first_touch=}')
-                print(f'{self.potted_this_turn=}')
 
                 # check first touch
                 if self.player_determined:
@@ -407,7 +415,6 @@ class GameStateEightBall(GameState):
 
                     if self.first_touch not in allowed_first_touch:
                         # foul: touched illegal ball
-                        print('foul, touched illegal ball')
                         foul = Foul.TOUCHED_ILLEGAL_BALL
 
                 if len(self.potted_this_turn) != 0:
@@ -426,7 +433,6 @@ class GameStateEightBall(GameState):
 
                     if BallType.BALL_CUE in self.potted_this_turn:
                         # foul: potted cue ball
-                        print('foul, potted cue ball')
                         foul = Foul.POTTED_CUE
                     
                     if BallType.BALL_BLACK in self.potted_this_turn:
@@ -444,17 +450,18 @@ class GameStateEightBall(GameState):
                             # foul black potted, other player won 
                             self.player_winner = self.get_player().next()
                             foul = Foul.POTTED_BLACK
-                        print(f'{self.player_winner} Wins')
                 
+                self.last_foul = foul
                 if foul != Foul.NONE:
+                    events.emit(Event.FOUL, player=self.get_player(), foul=foul)
                     next_state = State.MOVING_CUE_BALL
                     advance_turn = True
                     if foul == Foul.POTTED_BLACK:
                         next_state = State.GAME_OVER
                 if advance_turn:
                     self.player_turn = self.player_turn.next()
-                print(f'State: {next_state}, score: {self.score}')
                 self.round_count += 1
+                self.emit_end_of_turn(next_state)
 
             case State.MOVING_CUE_BALL:
                 next_state = State.PLAY
@@ -463,3 +470,10 @@ class GameStateEightBall(GameState):
                 next_state = State.GAME_OVER
         
         self.current_state = next_state
+
+def create_game_state(rules: Rules, table_dims) -> GameState:
+    match rules:
+        case Rules.EIGHT_BALL:
+            return GameStateEightBall(table_dims)
+        case Rules.SNOOKER:
+            return GameStateSnooker(table_dims)
@@ -0,0 +1,174 @@
+'''
+table layout module, cushions, holes and ball racks. needs no window
+'''
+
+from pygame.math import Vector2
+from random import shuffle
+from math import sqrt
+from typing import Dict
+from Physics import Ball, CueBall, Line, Hole
+from StateMachine import Rules, BallType
+
+TABLE_CENTER = Vector2(640, 400)
+POOL_LINE = 450
+
+snooker_numbers = {
+    BallType.SNOOKER_YELLOW: 102,
+    BallType.SNOOKER_GREEN: 103,
+    BallType.SNOOKER_BROWN: 104,
+    BallType.SNOOKER_BLUE: 105,
+    BallType.SNOOKER_PINK: 106,
+    BallType.SNOOKER_BLACK: 107,
+}
+
+def build_table(table_center: Vector2=TABLE_CENTER, pool_line: float=POOL_LINE) -> Dict[str, float]:
+    ''' place the table lines and holes, returns the table dimensions '''
+    pool_slit = 29
+    pool_d_slit = 36
+
+    left = table_center[0] - pool_line
+    right = table_center[0] + pool_line
+    top = table_center[1] - pool_line / 2
+    bottom = table_center[1] + pool_line / 2
+    center = table_center[0]
+
+    table_dims = {
+        'left': left,
+        'right': right,
+        'top': top,
+        'bottom': bottom,
+        'center': center,
+    }
+
+    # table lines
+    Line(Vector2(left, top + pool_d_slit), Vector2(left, bottom - pool_d_slit))
+    Line(Vector2(right, bottom - pool_d_slit), Vector2(right, top + pool_d_slit))
+    Line(Vector2(center - pool_slit, top), Vector2(left + pool_d_slit, top))
+    Line(Vector2(right - pool_d_slit, top), Vector2(center + pool_slit, top))
+    Line(Vector2(left + pool_d_slit, bottom), Vector2(center - pool_slit, bottom))
+    Line(Vector2(center + pool_slit, bottom), Vector2(right - pool_d_slit, bottom))
+
+    slit_offset = 45
+    slit_d_offset = 50
+    slit_center_offset = 10
+    Line(Vector2(left, top + pool_d_slit), Vector2(left - slit_d_offset, top + pool_d_slit - slit_d_offset))
+    Line(Vector2(left + pool_d_slit, top), Vector2(left + pool_d_slit - slit_d_offset, top - slit_d_offset))
+    Line(Vector2(right, top + pool_d_slit), Vector2(right + slit_d_offset, top + pool_d_slit - slit_d_offset))
+    Line(Vector2(right - pool_d_slit, top), Vector2(right - pool_d_slit + slit_d_offset, top - slit_d_offset))
+
+    Line(Vector2(left, bottom - pool_d_slit), Vector2(left - slit_d_offset, bottom - pool_d_slit + slit_d_offset))
+    Line(Vector2(left + pool_d_slit, bottom), Vector2(left + pool_d_slit - slit_d_offset, bottom + slit_d_offset))
+    Line(Vector2(right, bottom - pool_d_slit), Vector2(right + slit_d_offset, bottom - pool_d_slit + slit_d_offset))
+    Line(Vector2(right - pool_d_slit, bottom), Vector2(right - pool_d_slit + slit_d_offset, bottom + slit_d_offset))
+
+    Line(Vector2(center - pool_slit, top), Vector2(center - pool_slit + slit_center_offset, top - slit_offset))
+    Line(Vector2(center + pool_slit, top), Vector2(center + pool_slit - slit_center_offset, top - slit_offset))
+    Line(Vector2(center - pool_slit, bottom), Vector2(center - pool_slit + slit_center_offset, bottom + slit_offset))
+    Line(Vector2(center + pool_slit, bottom), Vector2(center + pool_slit - slit_center_offset, bottom + slit_offset))
+    Line._reg.reverse()
+    Line.build_index()
+
+    # build holes
+    hole_diagonal_offset = 30
+    hole_vertical_offset = 25
+    hole_radius = Ball._radius * 1.75
+    hole_d_radius = Ball._radius * 2
+    diagonal_adjust = 10
+    vertical_adjust = 23
+    Hole(Vector2(left - diagonal_adjust, top - diagonal_adjust), Vector2(hole_diagonal_offset, hole_diagonal_offset), hole_d_radius)
+    Hole(Vector2(left - diagonal_adjust, bottom + diagonal_adjust), Vector2(hole_diagonal_offset, -hole_diagonal_offset), hole_d_radius)
+    Hole(Vector2(right + diagonal_adjust, top - diagonal_adjust), Vector2(-hole_diagonal_offset, hole_diagonal_offset), hole_d_radius)
+    Hole(Vector2(right + diagonal_adjust, bottom + diagonal_adjust), Vector2(-hole_diagonal_offset, -hole_diagonal_offset), hole_d_radius)
+    Hole(Vector2(center, top - vertical_adjust), Vector2(0, hole_vertical_offset), hole_radius)
+    Hole(Vector2(center, bottom + vertical_adjust), Vector2(0, -hole_vertical_offset), hole_radius)
+
+    return table_dims
+
+def snooker_spots(table_center: Vector2=TABLE_CENTER, pool_line: float=POOL_LINE) -> Dict[BallType, Vector2]:
+    ''' spots of the colored balls, used for the rack and for respotting '''
+    offx = table_center[0] + pool_line * 0.5 - 2 * Ball._radius
+    offy = table_center[1] + Ball._radius
+
+    # first and last red on the middle row of the triangle
+    table_zero_pos = Vector2(Ball._radius * 1 * sqrt(3) + offx, Ball._radius * -1 + offy)
+    table_last_pos = Vector2(Ball._radius * 5 * sqrt(3) + offx, Ball._radius * -1 + offy)
+
+    return {
+        BallType.SNOOKER_YELLOW: table_center - (pool_line * 0.5, -pool_line * 0.25),
+        BallType.SNOOKER_GREEN: table_center - (pool_line * 0.5, pool_line * 0.25),
+        BallType.SNOOKER_BROWN: table_center - (pool_line * 0.5, 0),
+        BallType.SNOOKER_BLUE: Vector2(table_center),
+        BallType.SNOOKER_PINK: table_zero_pos + Vector2(-Ball._radius * 2, 0),
+        BallType.SNOOKER_BLACK: table_last_pos + Vector2(Ball._radius * 4, 0),
+    }
+
+def build_balls(rules: Rules, table_center: Vector2=TABLE_CENTER, pool_line: float=POOL_LINE):
+    ''' rack the balls and place the cue ball for the given rules '''
+    match rules:
+        case Rules.EIGHT_BALL:
+            numbers = [1, 2, 3, 4, 5, 6, 7, 9, 10, 11, 12, 13, 14, 15]
+            shuffle(numbers)
+
+            offx = table_center[0] + pool_line * 0.5 - 2 * Ball._radius
+            offy = table_center[1] + Ball._radius
+
+            ball_count = 0
+            for i in range(6):
+                for j in range(-i, i, 2):
+                    number = numbers.pop()
+                    if ball_count == 4:
+                        numbers.append(number)
+                        number = 8
+                    ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
+                    Ball(ball_pos, number=number)
+                    ball_count += 1
+
+            ball_pos = Vector2(table_center[0] - pool_line * 0.5, table_center[1])
+            CueBall(ball_pos)
+
+        case Rules.NINE_BALL:
+            numbers = [2, 3, 4, 5, 6, 7, 8]
+            shuffle(numbers)
+
+            offx = table_center[0] + pool_line * 0.5 - 2 * Ball._radius
+            offy = table_center[1] + Ball._radius
+
+            ball_count = 0
+            for i in range(5):
+                balls_in_col = - abs(i - 2) + 3
+                for j in range(-balls_in_col, balls_in_col, 2):
+                    number = numbers.pop()
+                    if ball_count == 0:
+                        numbers.append(number)
+                        number = 1
+                    if ball_count == 4:
+                        numbers.append(number)
+                        number = 9
+                    ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
+                    Ball(ball_pos, number=number)
+                    ball_count += 1
+
+            ball_pos = Vector2(table_center[0] - pool_line * 0.5, table_center[1])
+            CueBall(ball_pos)
+
+        case Rules.SNOOKER:
+            offx = table_center[0] + pool_line * 0.5 - 2 * Ball._radius
+            offy = table_center[1] + Ball._radius
+
+            for i in range(6):
+                for j in range(-i, i, 2):
+                    ball_pos = Vector2(Ball._radius * i * sqrt(3) + offx, Ball._radius * j + offy)
+                    Ball(ball_pos, number=101)
+
+            for ball_type, spot in snooker_spots(table_center, pool_line).items():
+                Ball(spot, number=snooker_numbers[ball_type])
+
+            ball_pos = Vector2(table_center[0] - pool_line * 0.5 - Ball._radius * 4, table_center[1])
+            CueBall(ball_pos)
+
+def respot_balls(respot, table_center: Vector2=TABLE_CENTER, pool_line: float=POOL_LINE):
+    ''' put potted snooker colors back on their spots '''
+    spots = snooker_spots(table_center, pool_line)
+    for ball_type in respot:
+        if ball_type in spots:
+            Ball(spots[ball_type], number=snooker_numbers[ball_type])
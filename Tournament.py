@@ -0,0 +1,175 @@
+'''
+cpu against cpu tournament. plays full matches between two cpu configurations headlessly across worker
+processes, without a window and without the turn delay of the cpus, and reports win rates, shots per frame,
+fouls and matches per second. the configurations swap seats every match so neither always breaks
+
+    python Tournament.py --matches 200 --rules EIGHT_BALL --cpu-a CPU:3 --cpu-b CPU:2:0.05 --processes 8
+
+a configuration is the player type, the dificulty and optionally the shot search budget in seconds, as in the
+cpu_config of the game
+'''
+
+import sys
+import random
+import argparse
+from multiprocessing import Pool
+from time import perf_counter
+from typing import List, Dict, Tuple
+from Physics import World, Solver
+from StateMachine import Rules, Player, Player_Type, State, Foul, create_game_state
+import Simulation
+import Table
+import Main
+
+MATCHES = 100
+MAX_TURNS = 400 # a match still going by then is counted as unfinished
+STALL_STEPS = 5 # cpu steps without an action before a turn counts as stuck
+CONFIGS = ['A', 'B']
+
+def parse_config(text: str) -> Tuple:
+    ''' TYPE:dificulty[:search budget] into a cpu_config value '''
+    parts = text.split(':')
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f'expected TYPE:dificulty[:search budget], got {text}')
+    try:
+        player_type = Player_Type[parts[0]]
+        config = (player_type, int(parts[1]))
+        if len(parts) == 3:
+            config += (float(parts[2]),)
+    except (KeyError, ValueError):
+        raise argparse.ArgumentTypeError(f'bad cpu configuration {text}')
+    if player_type == Player_Type.HUMAN:
+        raise argparse.ArgumentTypeError('a tournament is played by cpus')
+    return config
+
+def config_name(config: Tuple) -> str:
+    return ':'.join(c.name if isinstance(c, Player_Type) else str(c) for c in config)
+
+class MatchResult:
+    ''' one match, the shots and fouls by configuration '''
+    def __init__(self, seed: int, winner: str=None, shots: Dict[str, int]=None, fouls: Dict[str, int]=None,
+                 turns: int=0, stalled: bool=False, elapsed: float=0.0, error: str=None):
+        self.seed = seed
+        self.winner = winner # 'A', 'B' or None when the match did not finish
+        self.shots = shots if shots is not None else {config: 0 for config in CONFIGS}
+        self.fouls = fouls if fouls is not None else {config: 0 for config in CONFIGS}
+        self.turns = turns
+        self.stalled = stalled # a cpu could not act
+        self.elapsed = elapsed
+        self.error = error
+
+def play_match(task) -> MatchResult:
+    ''' one full match in a world of its own '''
+    rules, configs, seed, swap, max_turns, solver = task
+    start = perf_counter()
+    seats = {Player.PLAYER_1: CONFIGS[swap], Player.PLAYER_2: CONFIGS[1 - swap]}
+    cpu_config = {player: configs[seats[player]] for player in seats}
+    result = MatchResult(seed)
+    try:
+        random.seed(seed)
+        with World([], []).active():
+            table_dims = Table.build_table()
+            Table.build_balls(rules)
+            game_state = create_game_state(rules, table_dims)
+            cpus = {cpu.player: cpu for cpu in Main.create_cpus(rules, game_state, cpu_config, solver)}
+            for cpu in cpus.values():
+                cpu.turn_delay = 0
+
+            while game_state.get_state() != State.GAME_OVER and game_state.round_count < max_turns:
+                player = game_state.get_player()
+                state = game_state.get_state()
+                # the cpu places the cue ball or shoots in a step once it has a plan
+                for i in range(STALL_STEPS):
+                    cpus[player].step()
+                    if game_state.get_state() != state:
+                        break
+                else:
+                    result.stalled = True
+                    break
+
+                if game_state.get_state() == State.WAIT_FOR_STABLE:
+                    result.shots[seats[player]] += 1
+                    Simulation.run_to_rest(solver)
+                    Simulation.end_turn(game_state)
+                    if game_state.last_foul != Foul.NONE:
+                        result.fouls[seats[player]] += 1
+
+            if game_state.player_winner is not None:
+                result.winner = seats[game_state.player_winner]
+            result.turns = game_state.round_count
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+    result.elapsed = perf_counter() - start
+    return result
+
+def run_tournament(rules: Rules, configs: Dict[str, Tuple], matches: int=MATCHES, seed: int=0, processes: int=None,
+                   max_turns: int=MAX_TURNS, solver: Solver=Solver.FIXED_STEP) -> Dict:
+    tasks = [(rules, configs, seed + i, i % 2, max_turns, solver) for i in range(matches)]
+    start = perf_counter()
+    with Pool(processes) as pool:
+        results: List[MatchResult] = list(pool.imap_unordered(play_match, tasks))
+    elapsed = perf_counter() - start
+    return summarize(rules, configs, results, elapsed)
+
+def summarize(rules: Rules, configs: Dict[str, Tuple], results: List[MatchResult], elapsed: float) -> Dict:
+    finished = [result for result in results if result.winner is not None]
+    frames = len(finished)
+    report = {
+        'rules': rules.name,
+        'matches': len(results),
+        'finished': frames,
+        'unfinished': sum(result.winner is None and result.error is None and not result.stalled for result in results),
+        'stalled': [result.seed for result in results if result.stalled],
+        'errors': {result.seed: result.error for result in results if result.error is not None},
+        'elapsed': elapsed,
+        'matches_per_second': len(results) / elapsed if elapsed > 0 else 0.0,
+        'configs': {},
+    }
+    for config in CONFIGS:
+        wins = sum(result.winner == config for result in finished)
+        report['configs'][config] = {
+            'config': config_name(configs[config]),
+            'wins': wins,
+            'win_rate': wins / frames if frames else 0.0,
+            # over finished matches only, an unfinished one has no frame to count its shots in
+            'shots_per_frame': sum(result.shots[config] for result in finished) / frames if frames else 0.0,
+            'fouls': sum(result.fouls[config] for result in results),
+            'fouls_per_frame': sum(result.fouls[config] for result in finished) / frames if frames else 0.0,
+        }
+    report['shots_per_frame'] = sum(report['configs'][config]['shots_per_frame'] for config in CONFIGS)
+    return report
+
+def print_report(report: Dict):
+    print(f"{report['rules']}, {report['finished']}/{report['matches']} matches finished in {report['elapsed']:.1f}s, "
+          f"{report['matches_per_second']:.2f} matches/s, {report['shots_per_frame']:.1f} shots per frame")
+    print(f"{'':<3} {'config':<16} {'wins':>5} {'win rate':>9} {'shots/frame':>12} {'fouls':>6} {'fouls/frame':>12}")
+    for config, stats in report['configs'].items():
+        print(f"{config:<3} {stats['config']:<16} {stats['wins']:>5} {stats['win_rate']:>9.1%} {stats['shots_per_frame']:>12.1f} "
+              f"{stats['fouls']:>6} {stats['fouls_per_frame']:>12.1f}")
+    if report['unfinished']:
+        print(f"{report['unfinished']} matches reached the turn limit")
+    if report['stalled']:
+        print(f"STALLED seeds {report['stalled']}")
+    for seed, error in report['errors'].items():
+        print(f'ERROR seed {seed}: {error}')
+
+def main(argv: List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description='headless cpu against cpu tournament')
+    parser.add_argument('--matches', type=int, default=MATCHES)
+    parser.add_argument('--rules', choices=[Rules.EIGHT_BALL.name, Rules.SNOOKER.name], default=Rules.EIGHT_BALL.name)
+    parser.add_argument('--cpu-a', type=parse_config, default=(Player_Type.CPU, 3), help='TYPE:dificulty[:search budget]')
+    parser.add_argument('--cpu-b', type=parse_config, default=(Player_Type.CPU, 2), help='TYPE:dificulty[:search budget]')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first match, the others follow')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, defaults to the number of cores')
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS)
+    parser.add_argument('--solver', choices=[solver.name for solver in Solver], default=Solver.FIXED_STEP.name)
+    args = parser.parse_args(argv)
+
+    configs = {'A': args.cpu_a, 'B': args.cpu_b}
+    report = run_tournament(Rules[args.rules], configs, args.matches, args.seed, args.processes, args.max_turns, Solver[args.solver])
+    print_report(report)
+    # a soak test fails on anything that kept a match from being played out
+    return 1 if report['errors'] or report['stalled'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
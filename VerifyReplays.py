@@ -0,0 +1,76 @@
+'''
+re-simulates a directory of recorded matches headlessly across worker processes and checks that every match
+ends with the recorded score, winner and round count. doubles as a determinism regression test of the physics
+and a load test of the simulation core
+
+    python VerifyReplays.py replays/ --processes 8
+'''
+
+import os
+import sys
+import argparse
+from multiprocessing import Pool
+from time import perf_counter
+from typing import List
+from Replay import ReplayPlayer, TurnSummary, EXTENSION
+
+class VerifyResult:
+    def __init__(self, path: str, turns: int=0, mismatched_turns: int=0, final_matches: bool=False, error: str=None):
+        self.path = path
+        self.turns = turns
+        self.mismatched_turns = mismatched_turns # turns that did not end as recorded on the way
+        self.final_matches = final_matches
+        self.error = error
+
+    def is_ok(self) -> bool:
+        return self.error is None and self.final_matches
+
+def verify_replay(path: str) -> VerifyResult:
+    try:
+        with open(path, 'rb') as stream:
+            player = ReplayPlayer(stream)
+            turns = player.turn_count()
+            mismatched = player.play()
+            if turns == 0:
+                return VerifyResult(path, final_matches=True)
+            final = TurnSummary.of(player.game_state, 0).same_result(player.recorded_summary(turns - 1))
+            return VerifyResult(path, turns, mismatched, final)
+    except Exception as e:
+        return VerifyResult(path, error=f'{type(e).__name__}: {e}')
+
+def find_replays(directory: str) -> List[str]:
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(EXTENSION))
+
+def main(argv: List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description='re-simulate recorded matches and check their results')
+    parser.add_argument('directory', help=f'directory of {EXTENSION} replays')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, defaults to the number of cores')
+    args = parser.parse_args(argv)
+
+    paths = find_replays(args.directory)
+    if not paths:
+        print(f'no {EXTENSION} replays in {args.directory}')
+        return 1
+
+    start = perf_counter()
+    failed = 0
+    turns = 0
+    with Pool(args.processes) as pool:
+        for result in pool.imap_unordered(verify_replay, paths):
+            turns += result.turns
+            if result.error is not None:
+                failed += 1
+                print(f'ERROR    {result.path}: {result.error}')
+            elif not result.final_matches:
+                failed += 1
+                print(f'MISMATCH {result.path}: final result differs, {result.mismatched_turns} of {result.turns} turns differ')
+            elif result.mismatched_turns:
+                print(f'DRIFT    {result.path}: result matches, {result.mismatched_turns} of {result.turns} turns differ')
+    elapsed = perf_counter() - start
+
+    print(f'{len(paths) - failed}/{len(paths)} matches verified, {turns} turns in {elapsed:.2f}s')
+    print(f'{len(paths) / elapsed:.2f} matches/s, {turns / elapsed:.1f} turns/s')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
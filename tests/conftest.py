@@ -0,0 +1,17 @@
+import os
+import sys
+import random
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Physics import World
+import Table
+
+@pytest.fixture
+def table():
+    ''' an empty table in a world of its own, returns the table dimensions '''
+    random.seed(0)
+    with World([], []).active():
+        yield Table.build_table()
@@ -0,0 +1,35 @@
+import random
+from math import dist
+import numpy as np
+from pygame.math import Vector2
+from Calc import grid_candidate_pairs, all_pairs
+from StateMachine import Rules
+import Physics
+import Simulation
+import Table
+
+def test_grid_finds_every_close_pair_once():
+    rng = random.Random(2)
+    cell_size = 26.0
+    for trial in range(50):
+        points = [[rng.uniform(0, 300), rng.uniform(0, 200)] for i in range(rng.randint(0, 40))]
+        pairs = grid_candidate_pairs(points, cell_size)
+        assert pairs == sorted(set(pairs))
+        assert set(pairs) <= set(all_pairs(len(points)))
+        close = {(i, j) for i, j in all_pairs(len(points)) if dist(points[i], points[j]) < cell_size}
+        assert close <= set(pairs)
+
+def test_break_is_the_same_with_either_broad_phase(table):
+    results = []
+    for broad_phase in (True, False):
+        random.seed(0)
+        with Physics.World().active():
+            Table.build_balls(Rules.EIGHT_BALL)
+            Physics.broad_phase = broad_phase
+            try:
+                Physics.Ball._cue_ball.strike(Vector2(1, 0.01), 1.0)
+                Simulation.run_to_rest()
+            finally:
+                Physics.broad_phase = True
+            results.append(Physics.Ball._arrays.pos.copy())
+    assert np.array_equal(*results)
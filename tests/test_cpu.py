@@ -0,0 +1,74 @@
+from copy import deepcopy
+from pygame.math import Vector2
+from Physics import Ball, CueBall, TableState
+from StateMachine import GameStateEightBall, Rules, Player, BallType
+from Cpu import PlayerCpuEightBall
+from Mcts import PlayerCpuMctsEightBall, MctsNode
+import Table
+
+def determined_game(table_dims) -> GameStateEightBall:
+    game_state = GameStateEightBall(table_dims)
+    game_state.player_determined = True
+    game_state.player_ball_type = {Player.PLAYER_1: BallType.BALL_SOLID, Player.PLAYER_2: BallType.BALL_STRIPE}
+    return game_state
+
+def valid_types(cpu: PlayerCpuEightBall):
+    return {ball.get_type() for ball in Ball._reg if cpu.check_ball_validity(ball)}
+
+def test_hypothetical_finish_does_not_lock_the_cpu_on_black(table):
+    Table.build_balls(Rules.EIGHT_BALL)
+    game_state = determined_game(table)
+    cpu = PlayerCpuEightBall(game_state, Player.PLAYER_1)
+    cpu.pre_step()
+
+    finished = deepcopy(game_state)
+    finished.score[Player.PLAYER_1] = 7
+    with cpu.hypothetical(finished, TableState.capture()):
+        assert valid_types(cpu) == {BallType.BALL_BLACK}
+    cpu.evaluate_leave(finished, TableState.capture())
+
+    assert cpu.ball_type == BallType.BALL_SOLID
+    assert valid_types(cpu) == {BallType.BALL_SOLID}
+
+def test_open_table_never_targets_black(table):
+    Table.build_balls(Rules.EIGHT_BALL)
+    cpu = PlayerCpuEightBall(GameStateEightBall(table), Player.PLAYER_1)
+    assert valid_types(cpu) == {BallType.BALL_SOLID, BallType.BALL_STRIPE}
+
+def mcts_cpu(table_dims):
+    CueBall(Vector2(500, 400))
+    Ball(Vector2(700, 400), number=1)
+    Ball(Vector2(700, 300), number=9)
+    Ball(Vector2(900, 500), number=8)
+    game_state = determined_game(table_dims)
+    game_state.round_count = 1
+    game_state.score[Player.PLAYER_1] = 6
+    cpu = PlayerCpuMctsEightBall(game_state, Player.PLAYER_1, dificulty=1)
+    cpu.pre_step()
+    return cpu
+
+def test_mcts_search_leaves_the_cpu_state_alone(table):
+    cpu = mcts_cpu(table)
+
+    assert cpu.search_shot() is not None
+    assert cpu.determined
+    assert cpu.ball_type == BallType.BALL_SOLID
+    assert valid_types(cpu) == {BallType.BALL_SOLID}
+
+def test_mcts_reuses_a_planned_node_that_had_no_actions(table):
+    cpu = mcts_cpu(table)
+    # the shot played last turn led to a node the tree had found no actions from
+    planned = MctsNode(deepcopy(cpu.game_state), TableState.capture())
+    planned.untried = []
+    planned.terminal = True
+    cpu.planned = planned
+
+    assert cpu.search_shot() is not None
+    assert cpu.root is planned
+
+def test_mcts_node_without_actions_is_terminal(table):
+    cpu = mcts_cpu(table)
+    node = MctsNode(cpu.game_state, TableState.capture())
+    node.untried = []
+    assert cpu.expand(node) is node
+    assert node.terminal
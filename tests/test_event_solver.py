@@ -0,0 +1,64 @@
+import random
+import pytest
+import numpy as np
+from pygame.math import Vector2
+from Physics import Ball, CueBall, Hole, Solver, SUBSTEPS
+from StateMachine import Rules
+import EventSolver
+import Simulation
+import Table
+
+def overlap(pos: np.ndarray) -> float:
+    ''' deepest overlap of any two balls, in pixels '''
+    delta = pos[:, np.newaxis, :] - pos[np.newaxis, :, :]
+    distance = np.hypot(delta[..., 0], delta[..., 1])
+    np.fill_diagonal(distance, np.inf)
+    return max(0.0, Ball._radius * 2 - distance.min())
+
+def test_event_cap_does_not_let_balls_pass_through(table):
+    random.seed(0)
+    Table.build_balls(Rules.EIGHT_BALL)
+    Ball._cue_ball.strike(Vector2(1, 0.01), 1.0)
+    for frame in range(20):
+        EventSolver.advance(SUBSTEPS, max_events=3)
+        assert overlap(Ball._arrays.pos) < Ball._radius / 2
+
+    dims = table
+    pos = Ball._arrays.pos
+    assert (pos[:, 0] > dims['left'] - Ball._radius).all() and (pos[:, 0] < dims['right'] + Ball._radius).all()
+    assert (pos[:, 1] > dims['top'] - Ball._radius).all() and (pos[:, 1] < dims['bottom'] + Ball._radius).all()
+
+def rest_position(start: Vector2, direction: Vector2, power: float, solver: Solver) -> Vector2:
+    CueBall(start)
+    Ball._cue_ball.strike(direction, power)
+    Simulation.run_to_rest(solver)
+    position = Ball._cue_ball.pos
+    Ball._cue_ball.remove_from_table()
+    return position
+
+def test_free_roll_rests_where_the_fixed_step_does(table):
+    direction = Vector2(1, 0.2)
+    fixed = rest_position(Vector2(400, 380), direction, 0.2, Solver.FIXED_STEP)
+    event = rest_position(Vector2(400, 380), direction, 0.2, Solver.EVENT_DRIVEN)
+    # the same friction model, up to where each stops a component under the rest threshold
+    assert fixed.distance_to(event) < 0.01
+
+def potted(start: Vector2, direction: Vector2, power: float, solver: Solver) -> bool:
+    with Simulation.isolated_balls():
+        CueBall(start)
+        Ball._cue_ball.strike(direction, power)
+        Simulation.run_to_rest(solver)
+        return bool(Ball._potted_this_turn)
+
+# up the table at the top middle pocket, from straight in to wide of the pull of the pocket. wider still
+# the fixed step can rattle a ball in off the jaws the event solver bounces out of, that difference is known
+@pytest.mark.parametrize('offset', range(0, 28, 2))
+def test_pockets_capture_as_the_fixed_step_does(table, offset):
+    hole = Hole._reg[4]
+    start = Vector2(hole.pos.x + offset, hole.pos.y + 250)
+    fixed = potted(start, Vector2(0, -1), 0.5, Solver.FIXED_STEP)
+    event = potted(start, Vector2(0, -1), 0.5, Solver.EVENT_DRIVEN)
+    assert fixed == event
+    # a ball wide of the hole but inside its pull still drops
+    if offset <= 14:
+        assert event
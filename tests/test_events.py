@@ -0,0 +1,68 @@
+import io
+import json
+import pytest
+from Events import events, Event, RingBufferSink, FileSink, NullSink
+from Physics import Ball, TableState
+from StateMachine import GameStateEightBall, Rules, Player, BallType
+from Mcts import PlayerCpuMctsEightBall
+import Table
+
+@pytest.fixture
+def ring():
+    sink = RingBufferSink()
+    events.set_sink(sink)
+    yield sink
+    events.set_sink(NullSink())
+
+def test_null_sink_is_disabled():
+    assert not events.enabled
+
+def test_muted_drops_events_and_restores(ring):
+    with events.muted():
+        events.emit(Event.SHOT, power=1.0)
+    assert events.enabled
+    events.emit(Event.FOUL, foul='x')
+    assert [event.kind for event in ring.events] == [Event.FOUL]
+
+def test_ring_buffer_keeps_the_latest():
+    sink = RingBufferSink(size=3)
+    events.set_sink(sink)
+    try:
+        for i in range(5):
+            events.emit(Event.POT, ball=i)
+    finally:
+        events.set_sink(NullSink())
+    assert [event.fields['ball'] for event in sink.events] == [2, 3, 4]
+
+def test_file_sink_writes_in_batches():
+    file = io.StringIO()
+    events.set_sink(FileSink(file, flush_events=2, flush_interval=3600))
+    try:
+        events.emit(Event.POT, ball=1, type=BallType.BALL_SOLID)
+        assert file.getvalue() == ''
+        events.emit(Event.POT, ball=9, type=BallType.BALL_STRIPE)
+        lines = file.getvalue().splitlines()
+    finally:
+        events.close()
+    assert [json.loads(line)['type'] for line in lines] == ['BALL_SOLID', 'BALL_STRIPE']
+
+def test_cpu_planning_emits_no_events(table, ring):
+    Table.build_balls(Rules.EIGHT_BALL)
+    game_state = GameStateEightBall(table)
+    game_state.round_count = 1
+    cpu = PlayerCpuMctsEightBall(game_state, Player.PLAYER_1, dificulty=1)
+    ring.events.clear()
+    plan = cpu.plan_turn()
+    assert list(ring.events) == []
+
+    Ball._cue_ball.strike(plan.direction, plan.power)
+    assert [event.kind for event in ring.events] == [Event.SHOT]
+
+def test_restoring_other_balls_emits_no_events(table, ring):
+    Table.build_balls(Rules.EIGHT_BALL)
+    snapshot = TableState.snapshot()
+    Ball._reg[-1].potted()
+    ring.events.clear()
+    snapshot.restore()
+    assert len(Ball._reg) == len(snapshot)
+    assert list(ring.events) == []
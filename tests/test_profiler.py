@@ -0,0 +1,36 @@
+from pygame.math import Vector2
+from Profiler import Profiler, profiler
+from Physics import Ball, CueBall, TableState
+import Simulation
+
+def test_disabled_sections_record_nothing():
+    p = Profiler()
+    with p.section('a'):
+        pass
+    assert len(p.events) == 0
+
+def test_toggle_drops_the_unfinished_frame():
+    p = Profiler()
+    p.toggle()
+    with p.section('a'):
+        pass
+    p.toggle()
+    p.toggle()
+    p.frame()
+    assert p.averages() == []
+
+def test_simulated_shots_are_not_live_physics(table):
+    CueBall(Vector2(400, 400))
+    Ball(Vector2(600, 400), number=1)
+    table_state = TableState.capture()
+    profiler.toggle()
+    try:
+        with profiler.section('PlayerCpu.step'):
+            Simulation.simulate_shot(table_state, Vector2(1, 0), 0.5)
+        Simulation.step_frame()
+    finally:
+        profiler.toggle()
+    names = [name for name, start, duration in profiler.events]
+    profiler.events.clear()
+    assert names.count('step_balls') == 1
+    assert 'PlayerCpu.step' in names
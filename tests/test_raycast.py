@@ -0,0 +1,39 @@
+import random
+from math import inf
+from pygame.math import Vector2
+from Physics import Ball, CueBall
+from RayCast import RayIndex, Hit, ray_circle
+from Guide import Trajectory
+
+def test_ray_leaving_a_contact_along_the_tangent_misses():
+    # on the contact circle, heading along the tangent up to rounding
+    assert ray_circle(20.0, 0.0, -5e-15, 1.0, 0.0, 0.0, 20.0) == inf
+    assert ray_circle(20.0, 0.0, -1.0, 0.0, 0.0, 0.0, 20.0) == 0.0
+
+def test_cut_shot_path_goes_on_past_the_contact(table):
+    CueBall(Vector2(400, 400))
+    Ball(Vector2(600, 400 + Ball._radius), number=1)
+    trajectory = Trajectory(Vector2(400, 400), Vector2(1, 0))
+    trajectory.advance(inf)
+
+    assert trajectory.ghost is not None
+    after = trajectory.cue_path[trajectory.cue_path.index(trajectory.ghost) + 1]
+    assert after.distance_to(trajectory.ghost) > Ball._radius
+
+def test_cast_matches_brute_force(table):
+    random.seed(1)
+    dims = table
+    for i in range(12):
+        Ball(Vector2(random.uniform(dims['left'] + 30, dims['right'] - 30), random.uniform(dims['top'] + 30, dims['bottom'] - 30)), number=i + 1)
+    positions = Ball._arrays.pos.tolist()
+    index = RayIndex(positions)
+    for i in range(300):
+        origin = (random.uniform(dims['left'] + 30, dims['right'] - 30), random.uniform(dims['top'] + 30, dims['bottom'] - 30))
+        direction = Vector2(1, 0).rotate(random.uniform(0, 360))
+        hit = index.cast(origin, tuple(direction), 2000)
+        nearest = min((ray_circle(*origin, *direction, x, y, Ball._radius * 2) for x, y in positions), default=inf)
+        if hit is not None and hit[1] == Hit.BALL:
+            assert abs(hit[0] - nearest) < 1e-9
+        else:
+            # a cushion or pocket came first, or nothing at all
+            assert hit is None or hit[0] <= nearest + 1e-9
@@ -0,0 +1,8 @@
+import Physics
+import RenderBenchmark
+
+def test_solids_run_leaves_draw_solids_alone():
+    draw_solids = Physics.draw_solids
+    report = RenderBenchmark.run_benchmark(frames=2, solids=True)
+    assert report['meta']['draw_solids']
+    assert Physics.draw_solids == draw_solids
@@ -0,0 +1,80 @@
+import io
+import random
+import pytest
+from Physics import Ball, World, Solver
+from StateMachine import Rules, State, Player, Player_Type, BallType, create_game_state
+import Simulation
+import Table
+import Main
+import Replay
+
+def header(version: int) -> bytes:
+    return Replay.HEADER.pack(Replay.MAGIC, version, Rules.EIGHT_BALL.value, Solver.FIXED_STEP.value, 640.0, 400.0, 450.0)
+
+def test_header_round_trip():
+    rules, solver, center, pool_line = Replay.read_header(io.BytesIO(header(Replay.VERSION)))
+    assert (rules, solver, tuple(center), pool_line) == (Rules.EIGHT_BALL, Solver.FIXED_STEP, (640.0, 400.0), 450.0)
+
+@pytest.mark.parametrize('version', [0, Replay.VERSION + 1])
+def test_other_versions_are_rejected(version):
+    with pytest.raises(ValueError, match='version'):
+        Replay.read_header(io.BytesIO(header(version)))
+
+@pytest.mark.parametrize('data', [b'', b'PLRP', b'junk' * 20])
+def test_junk_is_rejected(data):
+    with pytest.raises(ValueError):
+        Replay.read_header(io.BytesIO(data))
+
+def record_match(rules: Rules, turns: int) -> bytes:
+    ''' a cpu against cpu match recorded the way the game loop does it, tick by tick '''
+    stream = io.BytesIO()
+    stream.close = lambda: None
+    recorder = Replay.ReplayRecorder(stream, keyframe_interval=3)
+    random.seed(3)
+    with World([], []).active():
+        table_dims = Table.build_table()
+        Table.build_balls(rules)
+        game_state = create_game_state(rules, table_dims)
+        cpu_config = {Player.PLAYER_1: (Player_Type.CPU, 3), Player.PLAYER_2: (Player_Type.CPU, 2)}
+        cpus = {cpu.player: cpu for cpu in Main.create_cpus(rules, game_state, cpu_config)}
+        recorder.start(rules, Solver.FIXED_STEP, game_state)
+        for cpu in cpus.values():
+            cpu.turn_delay = 0
+            cpu.recorder = recorder
+        while recorder.turn < turns and game_state.get_state() != State.GAME_OVER:
+            if game_state.get_state() == State.WAIT_FOR_STABLE:
+                Simulation.step_frame()
+                recorder.tick()
+                if Ball.check_stability():
+                    Simulation.end_turn(game_state)
+                    recorder.end_turn(game_state)
+            else:
+                cpus[game_state.get_player()].step()
+    return stream.getvalue()
+
+@pytest.mark.parametrize('rules', [Rules.EIGHT_BALL, Rules.SNOOKER])
+def test_replay_round_trip(rules):
+    data = record_match(rules, 7)
+    player = Replay.ReplayPlayer(io.BytesIO(data))
+    assert player.turn_count() == 7
+    assert player.play() == 0
+    final = player.game_state
+
+    # seeking lands on a keyframe or plays on from one, both must end the same
+    for turn in (0, 4, 6):
+        player.seek(turn)
+        assert player.play() == 0
+        assert player.game_state.__dict__ == final.__dict__
+
+@pytest.mark.parametrize('rules', [Rules.EIGHT_BALL, Rules.SNOOKER])
+def test_game_state_round_trip(rules):
+    game_state = create_game_state(rules, {'left': 0})
+    game_state.player_determined = True
+    game_state.player_ball_type = {Player.PLAYER_1: BallType.BALL_STRIPE, Player.PLAYER_2: BallType.BALL_SOLID}
+    game_state.potted_this_turn = [BallType.BALL_SOLID, BallType.BALL_CUE]
+    game_state.first_touch = BallType.BALL_BLACK
+    game_state.score = {Player.PLAYER_1: 3, Player.PLAYER_2: 12}
+    game_state.player_winner = Player.PLAYER_2
+    game_state.round_count = 40
+    restored = Replay.unpack_game_state(Replay.pack_game_state(game_state), rules, {'left': 0})
+    assert restored.__dict__ == game_state.__dict__
@@ -0,0 +1,38 @@
+import random
+import numpy as np
+from pygame.math import Vector2
+from Physics import Ball, CueBall, World, TableState
+from StateMachine import Rules
+import Simulation
+import Table
+
+def test_snapshot_restore_replays_a_shot(table):
+    random.seed(0)
+    Table.build_balls(Rules.EIGHT_BALL)
+    Ball._cue_ball.strike(Vector2(1, 0.01), 1.0)
+    for i in range(30):
+        Simulation.step_frame()
+    snapshot = TableState.snapshot()
+
+    Simulation.run_to_rest()
+    first = Ball._arrays.pos.copy()
+    snapshot.restore()
+    Simulation.run_to_rest()
+    assert np.array_equal(Ball._arrays.pos, first)
+
+def test_restore_stays_in_the_active_world(table):
+    CueBall(Vector2(400, 400))
+    Ball(Vector2(600, 400), number=1)
+    snapshot = TableState.snapshot()
+    live_balls = list(Ball._reg)
+
+    world = World()
+    with world.active():
+        CueBall(Vector2(300, 300))
+        registry = Ball._reg
+        snapshot.restore()
+        assert Ball._reg is registry
+        assert [ball.number for ball in Ball._reg] == [0, 1]
+    assert world.balls is registry
+    assert np.array_equal(world.arrays.pos, snapshot.positions)
+    assert Ball._reg == live_balls
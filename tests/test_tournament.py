@@ -0,0 +1,29 @@
+import os
+import sys
+import subprocess
+from Physics import Solver
+from StateMachine import Rules, Player_Type
+import Tournament
+
+CONFIGS = {'A': (Player_Type.CPU, 3), 'B': (Player_Type.CPU, 2)}
+TASK = (Rules.EIGHT_BALL, CONFIGS, 7, 0, 40, Solver.EVENT_DRIVEN)
+
+def match_summary(result: Tournament.MatchResult):
+    return (result.winner, result.shots, result.fouls, result.turns, result.stalled, result.error)
+
+def test_match_is_reproducible_from_its_seed():
+    result = Tournament.play_match(TASK)
+    assert result.error is None and not result.stalled
+    assert match_summary(result) == match_summary(Tournament.play_match(TASK))
+
+def test_match_is_reproducible_across_processes():
+    # a fresh interpreter draws its own import time randomness, the match must not depend on it
+    code = ('import Tournament, test_tournament; '
+            'print(test_tournament.match_summary(Tournament.play_match(test_tournament.TASK)))')
+    tests = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(tests), tests]), SDL_VIDEODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    runs = {subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+            for i in range(2)}
+    assert len(runs) == 1
+    assert runs == {str(match_summary(Tournament.play_match(TASK))) + '\n'}